@@ -16,6 +16,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'inventory',
     'corsheaders',
@@ -30,6 +31,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'inventory.routers.PrimaryAfterWriteMiddleware',
 ]
 CORS_ALLOW_ALL_ORIGINS = True 
 ROOT_URLCONF = 'ibms_backend.urls'
@@ -53,14 +55,94 @@ TEMPLATES = [
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'inventory_db',         # e.g., 'inventory_db'
-        'USER': 'postgres',        # e.g., 'postgres'
-        'PASSWORD': 'postgres',    # e.g., 'admin123'
-        'HOST': 'localhost',            # or use your server IP
-        'PORT': '5432',                 # default PostgreSQL port
+        'NAME': os.environ.get('DB_NAME', 'inventory_db'),
+        'USER': os.environ.get('DB_USER', 'postgres'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', 'postgres'),
+        'HOST': os.environ.get('DB_HOST', 'localhost'),
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        # Keep connections open between requests instead of reconnecting each time
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': os.environ.get('DB_CONN_HEALTH_CHECKS', 'True') == 'True',
     }
 }
 
+# Optional streaming replica. List, search, export and report views read from it
+# (see inventory/routers.py); writes, sync and everything else stay on the primary.
+# Other connection settings are shared with the primary.
+if os.environ.get('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ['DB_REPLICA_HOST'],
+        'PORT': os.environ.get('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['inventory.routers.ReplicaRouter']
+# Seconds after a write request during which reads stay on the primary; keep it
+# above the replica's usual lag. Share the cache (IBMS_CACHE_DIR) so every worker
+# sees the write.
+IBMS_REPLICA_STICKY_SECONDS = int(os.environ.get('IBMS_REPLICA_STICKY_SECONDS', 5))
+
+
+# FastJSONRenderer uses orjson when it is installed and otherwise behaves
+# exactly like DRF's JSONRenderer.
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'inventory.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+
+# Cache used for report responses, the typeahead invalidation counter and the
+# recent-write mark that keeps replica reads on the primary.
+# Local memory is per process, so set IBMS_CACHE_DIR to share the cache (and
+# its invalidation counters) between several workers on one host.
+if os.environ.get('IBMS_CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ['IBMS_CACHE_DIR'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'ibms',
+        }
+    }
+# Longest time (seconds) a worker keeps its typeahead index before reloading it,
+# so writes made through other workers show up even without a shared cache; 0 disables
+IBMS_TYPEAHEAD_MAX_AGE = int(os.environ.get('IBMS_TYPEAHEAD_MAX_AGE', 60))
+# How often (seconds) a worker reads the shared typeahead invalidation counter;
+# each read is a disk access with the file-based cache
+IBMS_TYPEAHEAD_CHECK_SECONDS = float(os.environ.get('IBMS_TYPEAHEAD_CHECK_SECONDS', 1))
+# Upper bound (seconds) for cached report responses; 'none' keeps them until the next write
+_report_cache_ttl = os.environ.get('IBMS_REPORT_CACHE_TTL', '300')
+IBMS_REPORT_CACHE_TTL = None if _report_cache_ttl.lower() == 'none' else int(_report_cache_ttl)
+
+# Rendered bill PDFs, evicted least recently used first above the size cap
+IBMS_PDF_CACHE_DIR = os.environ.get('IBMS_PDF_CACHE_DIR', str(BASE_DIR / 'pdf_cache'))
+IBMS_PDF_CACHE_MAX_BYTES = int(os.environ.get('IBMS_PDF_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+# Worker processes used for bulk bill PDF exports, shared by all exports in a process
+IBMS_PDF_WORKERS = int(os.environ.get('IBMS_PDF_WORKERS', os.cpu_count() or 1))
+# Combined PDFs are built in memory, so larger exports must use the streamed ZIP
+IBMS_COMBINED_PDF_MAX_BILLS = int(os.environ.get('IBMS_COMBINED_PDF_MAX_BILLS', 500))
+
+# Report jobs still running after this many seconds are assumed to have lost
+# their worker and are claimed again
+IBMS_REPORT_JOB_TIMEOUT = int(os.environ.get('IBMS_REPORT_JOB_TIMEOUT', 600))
+
+# Image recognition result cache (perceptual hash -> name/description).
+# Set IBMS_RECOGNITION_CACHE_FILE to keep it across restarts.
+IBMS_RECOGNITION_CACHE_SIZE = int(os.environ.get('IBMS_RECOGNITION_CACHE_SIZE', 1024))
+IBMS_RECOGNITION_CACHE_TTL = int(os.environ.get('IBMS_RECOGNITION_CACHE_TTL', 7 * 24 * 3600))
+IBMS_RECOGNITION_MAX_DISTANCE = int(os.environ.get('IBMS_RECOGNITION_MAX_DISTANCE', 6))
+IBMS_RECOGNITION_CACHE_FILE = os.environ.get('IBMS_RECOGNITION_CACHE_FILE')
+
+# Delta sync holds back rows younger than this many seconds, so rows from
+# transactions that commit late are not skipped by a client's watermark.
+IBMS_SYNC_SETTLE_SECONDS = float(os.environ.get('IBMS_SYNC_SETTLE_SECONDS', 5))
 
 WSGI_APPLICATION = 'ibms_backend.wsgi.application'
 
@@ -104,4 +186,18 @@ TWILIO_ACCOUNT_SID = os.environ.get('TWILIO_ACCOUNT_SID')
 TWILIO_AUTH_TOKEN = os.environ.get('TWILIO_AUTH_TOKEN')
 TWILIO_PHONE_NUMBER = os.environ.get('TWILIO_PHONE_NUMBER')
 
-GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY') 
\ No newline at end of file
+GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
+GEMINI_API_URL = os.environ.get(
+    'GEMINI_API_URL',
+    'https://generativelanguage.googleapis.com/v1/models/gemini-1.5-flash:generateContent',
+)
+GEMINI_CONNECT_TIMEOUT = float(os.environ.get('GEMINI_CONNECT_TIMEOUT', 3.05))
+GEMINI_READ_TIMEOUT = float(os.environ.get('GEMINI_READ_TIMEOUT', 30))
+GEMINI_MAX_RETRIES = int(os.environ.get('GEMINI_MAX_RETRIES', 2))
+GEMINI_MAX_CONCURRENCY = int(os.environ.get('GEMINI_MAX_CONCURRENCY', 8))
+# Longest image side (pixels) sent to Gemini; larger uploads are downscaled first
+GEMINI_MAX_IMAGE_SIDE = int(os.environ.get('GEMINI_MAX_IMAGE_SIDE', 1024))
+ 
+# Batch recognition: concurrent Gemini calls per request and images per request
+GEMINI_BATCH_PARALLELISM = int(os.environ.get('GEMINI_BATCH_PARALLELISM', 8))
+GEMINI_BATCH_MAX_IMAGES = int(os.environ.get('GEMINI_BATCH_MAX_IMAGES', 50))
@@ -1,8 +1,10 @@
 from django.contrib import admin
-from .models import Inventory, Customer, Bill, BillItem
+from .models import Inventory, Customer, Bill, BillItem, OutboxMessage, ReportJob
 
 # Register your models here.
 admin.site.register(Inventory)
 admin.site.register(Customer)
 admin.site.register(Bill)
 admin.site.register(BillItem)
+admin.site.register(OutboxMessage)
+admin.site.register(ReportJob)
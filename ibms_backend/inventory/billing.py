@@ -0,0 +1,127 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Q, Value, When
+from django.utils import timezone
+
+from .models import Inventory, Customer, Bill, BillItem
+from .notifications import queue_low_stock_alerts
+from .rollups import record_bill, record_customer_bill
+
+LOW_STOCK_THRESHOLD = 2
+
+
+class BillingError(Exception):
+    pass
+
+
+def _parse_lines(items):
+    # [{inventory_id, quantity, price}] -> [(inventory_id, quantity, price)]
+    lines = []
+    for item in items:
+        try:
+            inventory_id = int(item['inventory_id'])
+            qty = int(item['quantity'])
+            price = Decimal(str(item['price']))
+        except (KeyError, TypeError, ValueError, ArithmeticError):
+            raise BillingError('Each item needs inventory_id, quantity and price.')
+        if qty <= 0:
+            raise BillingError('Quantity must be greater than zero.')
+        lines.append((inventory_id, qty, price))
+    return lines
+
+
+def load_bill(bill_id):
+    """
+    Load a bill with its customer and items in two queries.
+
+    Items carry the name and unit price captured at sale time, so
+    nothing here joins Inventory. Returns (bill, items); raises
+    Bill.DoesNotExist for unknown ids.
+    """
+    bill = Bill.objects.select_related('customer').get(id=bill_id)
+    items = list(
+        BillItem.objects.filter(bill_id=bill.id)
+        .only('id', 'bill_id', 'inventory_id', 'name', 'quantity', 'price')
+        .order_by('id')
+    )
+    return bill, items
+
+
+def create_bill(customer_id, items):
+    """
+    Create a bill and decrement stock with a fixed number of queries.
+
+    All referenced inventory rows are locked in one SELECT ... FOR UPDATE
+    ordered by id, so concurrent bills always acquire locks in the same
+    order. Stock is checked in memory, bill items are bulk inserted and
+    stock is decremented with a single conditional UPDATE.
+
+    The daily sales rollups and the notification outbox (for low stock
+    alerts) are written in the same transaction. Returns the bill.
+    """
+    lines = _parse_lines(items)
+    requested = {}
+    for inventory_id, qty, _price in lines:
+        requested[inventory_id] = requested.get(inventory_id, 0) + qty
+
+    with transaction.atomic():
+        customer = Customer.objects.get(id=customer_id)
+        locked = {
+            inv.id: inv
+            for inv in Inventory.objects.select_for_update().filter(id__in=requested).order_by('id')
+        }
+        missing = sorted(set(requested) - set(locked))
+        if missing:
+            raise BillingError(f'Inventory item {missing[0]} does not exist.')
+        for inventory_id, qty in requested.items():
+            inventory = locked[inventory_id]
+            if inventory.quantity < qty:
+                raise BillingError(f'Not enough stock for {inventory.name}')
+
+        total = sum((price * qty for _id, qty, price in lines), Decimal('0'))
+        bill = Bill.objects.create(customer=customer, total=total)
+        BillItem.objects.bulk_create([
+            BillItem(bill=bill, inventory_id=inventory_id, name=locked[inventory_id].name, quantity=qty, price=price)
+            for inventory_id, qty, price in lines
+        ])
+        record_bill(bill, lines)
+        record_customer_bill(bill)
+
+        # Work out the new quantities and alert flags in memory so that
+        # a single UPDATE can apply both.
+        low_stock_items = []
+        flag_changes = {}
+        for inventory_id, qty in requested.items():
+            inventory = locked[inventory_id]
+            inventory.quantity -= qty
+            if inventory.quantity < LOW_STOCK_THRESHOLD and not inventory.low_stock_alert_sent:
+                inventory.low_stock_alert_sent = True
+                flag_changes[inventory_id] = True
+                low_stock_items.append(inventory)
+            elif inventory.quantity >= LOW_STOCK_THRESHOLD and inventory.low_stock_alert_sent:
+                inventory.low_stock_alert_sent = False
+                flag_changes[inventory_id] = False
+
+        guard = Q()
+        for inventory_id, qty in requested.items():
+            guard |= Q(id=inventory_id, quantity__gte=qty)
+        updates = {
+            'updated_at': timezone.now(),
+            'quantity': Case(
+                *[When(id=inventory_id, then=F('quantity') - qty) for inventory_id, qty in requested.items()],
+                default=F('quantity'),
+                output_field=PositiveIntegerField(),
+            ),
+        }
+        if flag_changes:
+            updates['low_stock_alert_sent'] = Case(
+                *[When(id=inventory_id, then=Value(sent)) for inventory_id, sent in flag_changes.items()],
+                default=F('low_stock_alert_sent'),
+            )
+        updated = Inventory.objects.filter(guard).update(**updates)
+        if updated != len(requested):
+            raise BillingError('Stock changed while the bill was being created.')
+        queue_low_stock_alerts(low_stock_items)
+
+    return bill
@@ -0,0 +1,182 @@
+import io
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from types import SimpleNamespace
+
+import django
+from django.conf import settings
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+from .filters import filter_bills
+from .models import Bill, BillItem
+from .pdfs import draw_bill, render_bill_pdf
+
+CHUNK_SIZE = 500
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class TooManyBills(ValueError):
+    pass
+
+
+def _new_pool(workers):
+    # Under the spawn and forkserver start methods (the default on macOS
+    # and from Python 3.14 on Linux) workers start with a fresh
+    # interpreter, so Django must be set up before a task unpickles
+    # anything that imports models.
+    return ProcessPoolExecutor(max_workers=workers, initializer=django.setup)
+
+
+def get_pool():
+    """
+    Rendering processes shared by every ZIP export in this process. They
+    are started on the first export and then reused, so a request does
+    not pay for spawning workers and concurrent exports together never
+    use more than IBMS_PDF_WORKERS processes.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = _new_pool(settings.IBMS_PDF_WORKERS)
+        return _pool
+
+
+def _discard_pool(pool):
+    # A worker died; the next export starts a fresh pool
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _load_chunks(params):
+    """
+    Yield lists of (bill, items) for the filtered bills, CHUNK_SIZE bills
+    at a time, using two queries per chunk. Rows are converted to plain
+    namespaces so they pickle cheaply into worker processes.
+    """
+    bills = filter_bills(Bill.objects.all(), params).order_by('date', 'id')
+    rows = bills.values_list('id', 'date', 'total', 'customer__name')
+    chunk = []
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        chunk.append(row)
+        if len(chunk) == CHUNK_SIZE:
+            yield _with_items(chunk)
+            chunk = []
+    if chunk:
+        yield _with_items(chunk)
+
+
+def _with_items(rows):
+    items = {}
+    for bill_id, quantity, price, name in (
+        BillItem.objects.filter(bill_id__in=[row[0] for row in rows])
+        .order_by('bill_id', 'id')
+        .values_list('bill_id', 'quantity', 'price', 'name')
+    ):
+        items.setdefault(bill_id, []).append(SimpleNamespace(quantity=quantity, price=price, name=name))
+    return [
+        (
+            SimpleNamespace(id=bill_id, date=date, total=total, customer=SimpleNamespace(name=customer_name)),
+            items.get(bill_id, []),
+        )
+        for bill_id, date, total, customer_name in rows
+    ]
+
+
+def _render(args):
+    bill, items = args
+    return bill.id, render_bill_pdf(bill, items)
+
+
+class _ZipStream:
+    # Write-only file object for zipfile; the bytes written since the
+    # last drain() are handed to the response as they are produced.
+    def __init__(self):
+        self.buffer = io.BytesIO()
+        self.offset = 0
+
+    def write(self, data):
+        self.offset += len(data)
+        return self.buffer.write(data)
+
+    def tell(self):
+        return self.offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return data
+
+
+def iter_zip(params, workers=None):
+    """
+    Stream a ZIP with one PDF per bill matching the list_bills filters.
+
+    Bills are rendered in worker processes in input order, and each PDF
+    is written to the archive and yielded as soon as it is ready. The
+    shared pool is used unless a number of workers is given, in which
+    case a pool is started just for this export (management command).
+    """
+    if workers:
+        with _new_pool(workers) as executor:
+            yield from _zip_chunks(params, executor, workers)
+        return
+    pool = get_pool()
+    try:
+        yield from _zip_chunks(params, pool, settings.IBMS_PDF_WORKERS)
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        raise
+
+
+def _zip_chunks(params, executor, workers):
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for chunk in _load_chunks(params):
+            for bill_id, data in executor.map(_render, chunk, chunksize=max(1, len(chunk) // (workers * 4))):
+                archive.writestr(f'bill_{bill_id}.pdf', data)
+                yield stream.drain()
+    # central directory
+    yield stream.drain()
+
+
+def check_combined_size(params):
+    """
+    Raise TooManyBills when a combined PDF would cover more than
+    IBMS_COMBINED_PDF_MAX_BILLS bills.
+    """
+    limit = settings.IBMS_COMBINED_PDF_MAX_BILLS
+    count = filter_bills(Bill.objects.all(), params).count()
+    if count > limit:
+        raise TooManyBills(
+            f'{count} bills match; combined PDFs are limited to {limit}. Narrow the range or use format=zip.'
+        )
+
+
+def iter_combined_pdf(params):
+    """
+    One PDF with every matching bill on its own pages.
+
+    ReportLab draws a document on a single canvas and only writes it out
+    on save(), so this cannot stream: the whole file is built in memory
+    and rendered serially. Callers must run check_combined_size() first;
+    the ZIP export streams and has no such limit.
+    """
+    buffer = io.BytesIO()
+    p = canvas.Canvas(buffer, pagesize=letter, invariant=1)
+    for chunk in _load_chunks(params):
+        for bill, items in chunk:
+            draw_bill(p, bill, items)
+    p.save()
+    yield buffer.getvalue()
@@ -0,0 +1,98 @@
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.response import Response
+
+GENERATION_KEY = 'ibms:data-generation'
+HITS_KEY = 'ibms:report-cache:hits'
+MISSES_KEY = 'ibms:report-cache:misses'
+
+
+def _incr(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        return cache.incr(key)
+
+
+# Generation counters that were evicted or flushed restart from the clock
+# instead of a constant, so they never return to a value that keys still
+# in the cache were built with.
+
+def _generation(key):
+    generation = cache.get(key)
+    if generation is None:
+        seed = time.time_ns()
+        cache.add(key, seed, timeout=None)
+        generation = cache.get(key, seed)
+    return generation
+
+
+def _incr_generation(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+        return cache.incr(key)
+
+
+def data_generation():
+    return _generation(GENERATION_KEY)
+
+
+def bump_data_generation():
+    """
+    Invalidate every cached report. Deferred until the surrounding
+    transaction commits so readers never cache data that is about to
+    change.
+    """
+    transaction.on_commit(lambda: _incr_generation(GENERATION_KEY))
+
+
+def cache_stats():
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    return {
+        'generation': data_generation(),
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / (hits + misses) if hits + misses else 0,
+    }
+
+
+def cached_report(view):
+    """
+    Cache the response data of a GET report view until the next write.
+
+    Keys include the data generation, so bump_data_generation() makes all
+    earlier entries unreachable and they simply age out. The local date
+    is part of the key because some reports default to "the last N days".
+    Entries also expire after settings.IBMS_REPORT_CACHE_TTL seconds.
+
+    The key is taken before the view queries anything, so a result is
+    never stored under a generation newer than the data it was read from.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return view(request, *args, **kwargs)
+        query = '&'.join(f'{k}={v}' for k, v in sorted(request.GET.items()))
+        key = f'ibms:report:{data_generation()}:{timezone.localdate()}:{view.__name__}:{query}'
+        data = cache.get(key)
+        if data is not None:
+            _incr(HITS_KEY)
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+        _incr(MISSES_KEY)
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, timeout=getattr(settings, 'IBMS_REPORT_CACHE_TTL', 300))
+        response['X-Cache'] = 'MISS'
+        return response
+    return wrapper
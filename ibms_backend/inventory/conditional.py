@@ -0,0 +1,85 @@
+import hashlib
+from functools import wraps
+
+from django.db.models import Count, Max
+from django.views.decorators.http import condition
+
+from .models import Inventory, Customer
+
+
+def conditional(state_func):
+    """
+    Answer If-None-Match / If-Modified-Since with 304 before the view runs.
+
+    state_func(request, *args, **kwargs) runs one cheap query and returns
+    (version, last_modified): version is any repr()-able value that
+    changes whenever the response would, last_modified the newest
+    updated_at it covers (or None). It returns None when the object does
+    not exist, and the view's 404 then goes out without validators.
+
+    The ETag is a hash of the view name, version, full path and Accept
+    header, so it also catches deletes that leave last_modified unchanged
+    and differs between pages, filters and formats; clients that send
+    both validators are judged on the ETag. Only GET and HEAD are
+    handled, other methods go straight to the view.
+
+    Responses get Cache-Control: no-cache so browsers revalidate every
+    time instead of guessing a freshness lifetime from Last-Modified.
+    """
+    def decorator(view):
+        def etag(request, *args, **kwargs):
+            state = request._conditional_state
+            if state is None:
+                return None
+            key = (view.__name__, state[0], request.get_full_path(), request.headers.get('Accept', ''))
+            return hashlib.md5(repr(key).encode()).hexdigest()
+
+        def last_modified(request, *args, **kwargs):
+            state = request._conditional_state
+            return state and state[1]
+
+        conditional_view = condition(etag_func=etag, last_modified_func=last_modified)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            # condition() asks for the ETag and Last-Modified separately
+            request._conditional_state = state_func(request, *args, **kwargs)
+            response = conditional_view(request, *args, **kwargs)
+            if not response.has_header('Cache-Control'):
+                response['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
+
+
+def _table_state(model):
+    row = model.objects.aggregate(last=Max('updated_at'), count=Count('id'))
+    return (row['count'], row['last']), row['last']
+
+
+def inventory_list_state(request):
+    return _table_state(Inventory)
+
+
+def customer_list_state(request):
+    return _table_state(Customer)
+
+
+def inventory_item_state(request, id):
+    updated_at = Inventory.objects.filter(id=id).values_list('updated_at', flat=True).first()
+    return None if updated_at is None else (updated_at, updated_at)
+
+
+def customer_history_state(request, id):
+    # Bills are never edited, so the running stats change with every bill.
+    # Customers without bills have no stats row, hence the left join.
+    stats = (
+        Customer.objects.filter(id=id)
+        .values_list('stats__bill_count', 'stats__lifetime_spend', 'stats__first_purchase_at', 'stats__last_purchase_at')
+        .first()
+    )
+    if stats is None:
+        return None
+    return (id, stats), stats[3]
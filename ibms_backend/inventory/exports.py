@@ -0,0 +1,83 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import DecimalField, ExpressionWrapper, F
+from django.http import StreamingHttpResponse
+
+from .filters import filter_bills
+from .models import Inventory, Bill, BillItem
+
+CHUNK_SIZE = 2000
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def bill_rows(params):
+    bills = filter_bills(Bill.objects.all(), params).order_by('-date', '-id')
+    columns = ['id', 'date', 'total', 'customer_id', 'customer_name']
+    return columns, bills.values_list('id', 'date', 'total', 'customer_id', 'customer__name')
+
+
+def bill_item_rows(params):
+    items = filter_bills(BillItem.objects.all(), params, prefix='bill__').order_by('-bill__date', 'bill_id', 'id')
+    items = items.annotate(line_total=ExpressionWrapper(
+        F('quantity') * F('price'), output_field=DecimalField(max_digits=12, decimal_places=2),
+    ))
+    columns = [
+        'bill_id', 'bill_date', 'customer_id', 'customer_name',
+        'item_id', 'inventory_id', 'item_name', 'quantity', 'price', 'line_total',
+    ]
+    return columns, items.values_list(
+        'bill_id', 'bill__date', 'bill__customer_id', 'bill__customer__name',
+        'id', 'inventory_id', 'name', 'quantity', 'price', 'line_total',
+    )
+
+
+def inventory_rows(params):
+    columns = ['id', 'sku', 'name', 'description', 'quantity', 'price', 'created_at', 'updated_at']
+    return columns, Inventory.objects.order_by('id').values_list(*columns)
+
+
+EXPORTS = {
+    'bills': bill_rows,
+    'bill-items': bill_item_rows,
+    'inventory': inventory_rows,
+}
+
+
+class _Echo:
+    # csv.writer only needs an object with write(); returning the line
+    # lets each row be yielded straight into the response.
+    def write(self, value):
+        return value
+
+
+def _csv_lines(columns, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _ndjson_lines(columns, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+def stream_export(name, fmt, params):
+    """
+    Stream an export as CSV or NDJSON.
+
+    Rows come from values_list() through QuerySet.iterator(), which uses a
+    server-side cursor on Postgres, so memory stays flat regardless of
+    how many rows are exported.
+    """
+    columns, rows = EXPORTS[name](params)
+    rows = rows.iterator(chunk_size=CHUNK_SIZE)
+    lines = _csv_lines(columns, rows) if fmt == 'csv' else _ndjson_lines(columns, rows)
+    response = StreamingHttpResponse(lines, content_type=FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{name}.{fmt}"'
+    return response
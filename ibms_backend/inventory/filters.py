@@ -0,0 +1,50 @@
+from django.db.models.functions import Upper
+from django.utils.dateparse import parse_date, parse_datetime
+
+
+class InvalidFilter(ValueError):
+    pass
+
+
+def _check_date(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        valid = parse_datetime(value) or parse_date(value)
+    except ValueError:
+        # Well formed but out of range, e.g. 2026-02-30
+        valid = None
+    if not valid:
+        raise InvalidFilter(f'{name} must be a date (YYYY-MM-DD) or an ISO 8601 datetime.')
+    return value
+
+
+def parse_bill_filters(params):
+    """
+    Validate the list_bills query parameters and return them as
+    (search, start_date, end_date). Raises InvalidFilter on a bad date,
+    which callers turn into a 400 before any streaming starts.
+    """
+    return params.get('search', '').strip(), _check_date(params, 'start_date'), _check_date(params, 'end_date')
+
+
+def filter_bills(queryset, params, prefix=''):
+    """
+    Apply the list_bills query parameters (search, start_date, end_date)
+    to a queryset. prefix lets the same filters run against related
+    models, e.g. prefix='bill__' for BillItem querysets.
+    """
+    search, start_date, end_date = parse_bill_filters(params)
+    if search:
+        if search.isdigit():
+            queryset = queryset.filter(**{f'{prefix}id': int(search)})
+        else:
+            # UPPER(name) LIKE ... can use the customer name trigram index
+            queryset = queryset.alias(_customer_name=Upper(f'{prefix}customer__name'))
+            queryset = queryset.filter(_customer_name__contains=search.upper())
+    if start_date:
+        queryset = queryset.filter(**{f'{prefix}date__gte': start_date})
+    if end_date:
+        queryset = queryset.filter(**{f'{prefix}date__lte': end_date})
+    return queryset
@@ -0,0 +1,183 @@
+import asyncio
+import atexit
+import base64
+import io
+import json
+import random
+import re
+import threading
+
+import aiohttp
+from django.conf import settings
+from PIL import Image, UnidentifiedImageError
+
+PROMPT = (
+    "Identify the object in this image and provide a short name and a concise description "
+    "suitable for an inventory system. Respond in JSON with 'name' and 'description' fields only."
+)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class GeminiError(Exception):
+    """Carries the JSON error body that recognize_item_ai returns."""
+
+    def __init__(self, payload, status=500):
+        super().__init__(payload.get('error'))
+        self.payload = payload
+        self.status = status
+
+
+def shrink_image(image_bytes, max_side, quality=85):
+    """
+    Downscale an image so its longest side is at most max_side and
+    re-encode it as JPEG. Small JPEGs and undecodable data are returned
+    unchanged.
+    """
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            if image.format == 'JPEG' and max(image.size) <= max_side:
+                return image_bytes
+            image.draft('RGB', (max_side, max_side))
+            image = image.convert('RGB')
+            image.thumbnail((max_side, max_side), Image.LANCZOS)
+            out = io.BytesIO()
+            image.save(out, 'JPEG', quality=quality, optimize=True)
+    except (UnidentifiedImageError, OSError, ValueError):
+        return image_bytes
+    return out.getvalue()
+
+
+def build_payload(image_bytes):
+    return {
+        "contents": [
+            {
+                "parts": [
+                    {"text": PROMPT},
+                    {"inlineData": {"mimeType": "image/jpeg", "data": base64.b64encode(image_bytes).decode()}}
+                ]
+            }
+        ]
+    }
+
+
+def parse_response(gemini_data):
+    """Extract {'name', 'description'} from Gemini's text response."""
+    try:
+        text = gemini_data['candidates'][0]['content']['parts'][0]['text']
+        match = re.search(r'\{.*\}', text, re.DOTALL)
+        if not match:
+            raise GeminiError({'error': 'Could not parse AI response', 'raw': text})
+        ai_result = json.loads(match.group(0))
+        return {
+            'name': ai_result.get('name', ''),
+            'description': ai_result.get('description', '')
+        }
+    except GeminiError:
+        raise
+    except Exception as e:
+        raise GeminiError({'error': 'Error parsing AI response', 'details': str(e), 'raw': gemini_data})
+
+
+class _LoopThread:
+    """An event loop running forever in a daemon thread."""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, name='gemini-client', daemon=True).start()
+
+    async def run(self, coro):
+        """Run coro on this loop and await its result from any other loop."""
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self.loop))
+
+    def run_sync(self, coro, timeout=None):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+
+class AsyncGeminiClient:
+    """
+    Gemini vision client shared by all requests in a process.
+
+    One pooled aiohttp session keeps TLS connections alive, every call
+    has connect/read timeouts, transient failures are retried a bounded
+    number of times with jittered exponential backoff, and a semaphore
+    caps how many calls are in flight at once.
+
+    The session and semaphore are tied to an event loop, but under WSGI
+    every request runs the async views in a loop of its own. So the
+    client owns a loop in a background thread and all HTTP work runs
+    there; callers on any loop just await the result. Image shrinking
+    is CPU work and runs in a worker thread.
+    """
+
+    def __init__(self, api_key=None, url=None, connect_timeout=None, read_timeout=None,
+                 max_retries=None, max_concurrency=None, max_image_side=None):
+        self.api_key = api_key if api_key is not None else settings.GEMINI_API_KEY
+        self.url = url or settings.GEMINI_API_URL
+        self.timeout = aiohttp.ClientTimeout(
+            sock_connect=connect_timeout or settings.GEMINI_CONNECT_TIMEOUT,
+            sock_read=read_timeout or settings.GEMINI_READ_TIMEOUT,
+        )
+        self.max_retries = max_retries if max_retries is not None else settings.GEMINI_MAX_RETRIES
+        self.max_image_side = max_image_side or settings.GEMINI_MAX_IMAGE_SIDE
+        self.max_concurrency = max_concurrency or settings.GEMINI_MAX_CONCURRENCY
+        self.slots = asyncio.Semaphore(self.max_concurrency)
+        self.session = None
+        self.runner = _LoopThread()
+
+    def _get_session(self):
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                timeout=self.timeout,
+                connector=aiohttp.TCPConnector(limit=self.max_concurrency),
+            )
+        return self.session
+
+    def backoff(self, attempt):
+        return min(0.25 * 2 ** attempt, 4.0) * random.uniform(0.5, 1.5)
+
+    async def _generate(self, payload):
+        # Runs on the client's own loop
+        session = self._get_session()
+        params = {'key': self.api_key} if self.api_key else None
+        attempt = 0
+        while True:
+            try:
+                async with self.slots:
+                    async with session.post(self.url, params=params, json=payload) as response:
+                        status = response.status
+                        if status == 200:
+                            return await response.json(content_type=None)
+                        text = await response.text()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt >= self.max_retries:
+                    raise GeminiError({'error': 'Gemini API error', 'details': str(e) or 'timeout'}, status=504)
+            else:
+                if status not in RETRY_STATUSES or attempt >= self.max_retries:
+                    raise GeminiError({'error': 'Gemini API error', 'details': text})
+            await asyncio.sleep(self.backoff(attempt))
+            attempt += 1
+
+    async def generate(self, payload):
+        """POST a generateContent payload and return the decoded JSON."""
+        return await self.runner.run(self._generate(payload))
+
+    async def recognize(self, image_bytes):
+        image_bytes = await asyncio.to_thread(shrink_image, image_bytes, self.max_image_side)
+        return parse_response(await self.generate(build_payload(image_bytes)))
+
+    def close(self, timeout=5):
+        if self.session is not None and not self.session.closed:
+            self.runner.run_sync(self.session.close(), timeout)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_async_gemini_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = AsyncGeminiClient()
+            atexit.register(_client.close)
+        return _client
@@ -0,0 +1,381 @@
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from .cache import bump_data_generation
+from .models import Customer, Inventory
+from .typeahead import invalidate_typeahead
+
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+READ_SIZE = 64 * 1024
+MAX_PRICE = Decimal('99999999.99')
+# Largest value a PositiveIntegerField holds on every backend
+MAX_QUANTITY = 2147483647
+ON_EXISTING = ('skip', 'update')
+
+
+def _text(fileobj):
+    if isinstance(fileobj, io.TextIOBase):
+        return fileobj
+    return io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+
+
+def iter_csv(fileobj):
+    yield from csv.DictReader(_text(fileobj))
+
+
+def iter_ndjson(fileobj):
+    for line in _text(fileobj):
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_json_array(fileobj):
+    """
+    Yield the objects of a top-level JSON array without reading the whole
+    file, by decoding one element at a time from a rolling buffer.
+    """
+    stream = _text(fileobj)
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    started = False
+    eof = False
+    while True:
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+        if pos >= len(buffer) or (not eof and len(buffer) - pos < READ_SIZE):
+            if not eof:
+                chunk = stream.read(READ_SIZE)
+                eof = not chunk
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                continue
+            if pos >= len(buffer):
+                raise ValueError('Unexpected end of JSON array.')
+        if not started:
+            if buffer[pos] != '[':
+                raise ValueError('JSON input must be an array of objects.')
+            started = True
+            pos += 1
+            continue
+        if buffer[pos] == ']':
+            return
+        try:
+            value, pos = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = stream.read(READ_SIZE)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+        yield value
+
+
+READERS = {
+    'csv': iter_csv,
+    'json': iter_json_array,
+    'ndjson': iter_ndjson,
+}
+
+
+def detect_format(filename):
+    name = (filename or '').lower()
+    for fmt in ('ndjson', 'jsonl', 'json', 'csv'):
+        if name.endswith('.' + fmt):
+            return 'ndjson' if fmt == 'jsonl' else fmt
+    return None
+
+
+def clean_inventory_row(row):
+    """Validate one import row. Returns (values, errors)."""
+    if not isinstance(row, dict):
+        return None, {'row': 'Expected an object.'}
+    errors = {}
+    sku = str(row.get('sku') or '').strip()
+    name = str(row.get('name') or '').strip()
+    description = str(row.get('description') or '')
+    if not sku:
+        errors['sku'] = 'This field is required.'
+    elif len(sku) > 64:
+        errors['sku'] = 'Ensure this field has no more than 64 characters.'
+    if not name:
+        errors['name'] = 'This field is required.'
+    elif len(name) > 100:
+        errors['name'] = 'Ensure this field has no more than 100 characters.'
+    try:
+        # Through Decimal so 1.7 (from JSON) and "1.7" are both rejected
+        # instead of int() truncating the float
+        number = Decimal(str(row.get('quantity') or 0))
+        if number != number.to_integral_value():
+            raise ValueError
+        quantity = int(number)
+        if not 0 <= quantity <= MAX_QUANTITY:
+            raise ValueError
+    except (ArithmeticError, TypeError, ValueError):
+        errors['quantity'] = 'Must be a non-negative whole number.'
+        quantity = None
+    try:
+        price = Decimal(str(row.get('price') or 0)).quantize(Decimal('0.01'))
+        if price < 0 or price > MAX_PRICE:
+            raise InvalidOperation
+    except (InvalidOperation, ValueError):
+        errors['price'] = 'Must be a non-negative amount with at most 8 digits before the decimal point.'
+        price = None
+    if errors:
+        return None, errors
+    return {'sku': sku, 'name': name, 'description': description, 'quantity': quantity, 'price': price}, None
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors = []
+
+    def add_error(self, row_number, errors):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'errors': errors})
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'failed': self.failed,
+            'errors': self.errors,
+        }
+
+
+def _upsert_chunk(chunk, result):
+    # Last row wins when a SKU repeats within the chunk
+    by_sku = {}
+    for row_number, values in chunk:
+        by_sku[values['sku']] = (row_number, values)
+    try:
+        with transaction.atomic():
+            existing = set(Inventory.objects.filter(sku__in=by_sku).values_list('sku', flat=True))
+            Inventory.objects.bulk_create(
+                [Inventory(**values) for _row, values in by_sku.values()],
+                update_conflicts=True,
+                unique_fields=['sku'],
+                update_fields=['name', 'description', 'quantity', 'price', 'updated_at'],
+            )
+    except DatabaseError as e:
+        if len(chunk) == 1:
+            result.add_error(chunk[0][0], {'database': str(e)})
+            return
+        # One bad row fails the whole statement; retry the rows one by one
+        # so only the bad ones are reported
+        for row in chunk:
+            _upsert_chunk([row], result)
+        return
+    result.updated += len(existing)
+    result.inserted += len(by_sku) - len(existing)
+    # Duplicates inside the chunk were applied as updates of the same row
+    result.updated += len(chunk) - len(by_sku)
+
+
+def import_inventory(rows, chunk_size=CHUNK_SIZE):
+    """
+    Upsert inventory rows (dicts with sku, name, description, quantity,
+    price) keyed by SKU.
+
+    Rows are validated and written chunk by chunk with one bulk
+    INSERT ... ON CONFLICT (sku) DO UPDATE each, so memory stays bounded
+    and invalid rows are reported without aborting the rest.
+    """
+    result = ImportResult()
+    chunk = []
+    try:
+        for row_number, row in enumerate(rows, 1):
+            result.rows += 1
+            values, errors = clean_inventory_row(row)
+            if errors:
+                result.add_error(row_number, errors)
+                continue
+            chunk.append((row_number, values))
+            if len(chunk) >= chunk_size:
+                _upsert_chunk(chunk, result)
+                chunk = []
+    except (ValueError, csv.Error) as e:
+        # Malformed input: keep what was imported so far and stop
+        result.add_error(result.rows + 1, {'file': str(e)})
+    if chunk:
+        _upsert_chunk(chunk, result)
+    if result.inserted or result.updated:
+        bump_data_generation()
+        invalidate_typeahead()
+    return result
+
+
+def clean_customer_row(row):
+    """Validate one customer import row. Returns (values, errors)."""
+    if not isinstance(row, dict):
+        return None, {'row': 'Expected an object.'}
+    errors = {}
+    name = str(row.get('name') or '').strip()
+    email = str(row.get('email') or '').strip()
+    phone = str(row.get('phone') or '').strip()
+    if not name:
+        errors['name'] = 'This field is required.'
+    elif len(name) > 100:
+        errors['name'] = 'Ensure this field has no more than 100 characters.'
+    if not email:
+        errors['email'] = 'This field is required.'
+    else:
+        try:
+            validate_email(email)
+        except ValidationError:
+            errors['email'] = 'Enter a valid email address.'
+    if not phone:
+        errors['phone'] = 'This field is required.'
+    elif len(phone) > 20:
+        errors['phone'] = 'Ensure this field has no more than 20 characters.'
+    if errors:
+        return None, errors
+    return {'name': name, 'email': email, 'phone': phone}, None
+
+
+class CustomerImportResult(ImportResult):
+    def __init__(self):
+        super().__init__()
+        self.skipped = 0
+        self.conflicts = 0
+
+    def add_conflict(self, row_number, message):
+        self.conflicts += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'conflict': message})
+
+    def as_dict(self):
+        data = super().as_dict()
+        data['skipped'] = self.skipped
+        data['conflicts'] = self.conflicts
+        return data
+
+
+def _import_customer_chunk(chunk, on_existing, result, claimed):
+    emails = [values['email'] for _row, values in chunk]
+    phones = [values['phone'] for _row, values in chunk]
+    try:
+        with transaction.atomic():
+            # One IN lookup per unique key for the whole chunk
+            by_email = {}
+            by_phone = {}
+            for customer in Customer.objects.filter(email__in=emails).only('id', 'email', 'phone'):
+                by_email[customer.email] = customer
+            for customer in Customer.objects.filter(phone__in=phones).only('id', 'email', 'phone'):
+                by_phone[customer.phone] = customer
+            new = []
+            updates = {}
+            previous = {}  # id -> the matched customer's keys before the update
+            for row_number, values in chunk:
+                email_match = by_email.get(values['email'])
+                phone_match = by_phone.get(values['phone'])
+                # A key an earlier chunk's update replaced no longer matches
+                # in the database, but still points at that customer
+                earlier = claimed.get(('email', values['email'])) or claimed.get(('phone', values['phone']))
+                if email_match and phone_match and email_match.id != phone_match.id:
+                    result.add_conflict(row_number, (
+                        f"email belongs to customer {email_match.id}, phone to customer {phone_match.id}."
+                    ))
+                elif email_match or phone_match or earlier:
+                    match = email_match or phone_match
+                    customer_id = match.id if match else earlier
+                    if on_existing != 'update':
+                        result.skipped += 1
+                    elif earlier or customer_id in updates:
+                        # e.g. one row matched by email and another by phone;
+                        # the second would silently overwrite the first
+                        result.add_conflict(row_number, f'customer {customer_id} was already updated by an earlier row.')
+                    else:
+                        updates[customer_id] = Customer(id=customer_id, **values)
+                        previous[customer_id] = match
+                else:
+                    new.append((row_number, values))
+            Customer.objects.bulk_create(
+                [Customer(**values) for _row, values in new], ignore_conflicts=True,
+            )
+            if updates:
+                now = timezone.now()
+                for customer in updates.values():
+                    customer.updated_at = now
+                Customer.objects.bulk_update(updates.values(), ['name', 'email', 'phone', 'updated_at'])
+            # ignore_conflicts hides rows that lost a race with another
+            # writer, so check which of ours actually landed.
+            stored = dict(Customer.objects.filter(
+                email__in=[values['email'] for _row, values in new],
+            ).values_list('email', 'phone'))
+    except DatabaseError as e:
+        for row_number, _values in chunk:
+            result.add_error(row_number, {'database': str(e)})
+        return
+    result.updated += len(updates)
+    for customer_id, match in previous.items():
+        claimed[('email', match.email)] = customer_id
+        claimed[('phone', match.phone)] = customer_id
+    for row_number, values in new:
+        if stored.get(values['email']) == values['phone']:
+            result.inserted += 1
+        else:
+            result.add_conflict(row_number, 'email or phone was added by another import.')
+
+
+def import_customers(rows, on_existing='skip', chunk_size=CHUNK_SIZE):
+    """
+    Bulk insert customers (dicts with name, email, phone).
+
+    Rows repeating an email or phone seen earlier in the input are
+    skipped. Rows matching an existing customer on either key are
+    skipped or, with on_existing='update', overwrite that customer;
+    rows whose email and phone belong to two different customers, and
+    rows matching a customer an earlier row already updated, are
+    reported as conflicts. Each chunk costs a fixed handful of queries.
+    """
+    if on_existing not in ON_EXISTING:
+        raise ValueError("on_existing must be 'skip' or 'update'.")
+    result = CustomerImportResult()
+    seen_emails = set()
+    seen_phones = set()
+    # ('email' or 'phone', value before the update) -> id of each
+    # existing customer updated so far
+    claimed = {}
+    chunk = []
+    try:
+        for row_number, row in enumerate(rows, 1):
+            result.rows += 1
+            values, errors = clean_customer_row(row)
+            if errors:
+                result.add_error(row_number, errors)
+                continue
+            if values['email'] in seen_emails or values['phone'] in seen_phones:
+                result.skipped += 1
+                continue
+            seen_emails.add(values['email'])
+            seen_phones.add(values['phone'])
+            chunk.append((row_number, values))
+            if len(chunk) >= chunk_size:
+                _import_customer_chunk(chunk, on_existing, result, claimed)
+                chunk = []
+    except (ValueError, csv.Error) as e:
+        result.add_error(result.rows + 1, {'file': str(e)})
+    if chunk:
+        _import_customer_chunk(chunk, on_existing, result, claimed)
+    if result.inserted or result.updated:
+        bump_data_generation()
+        invalidate_typeahead()
+    return result
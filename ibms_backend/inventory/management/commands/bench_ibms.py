@@ -0,0 +1,335 @@
+import json
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from contextlib import ExitStack
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from inventory import urls
+from inventory.cache import bump_data_generation
+from inventory.exports import EXPORTS
+from inventory.management.commands.bench_recognition import distinct_images, stub_server
+from inventory.manager_report import enqueue_report
+from inventory.models import Bill, BillItem, Customer, CustomerStats, Inventory, NotificationSetting
+from inventory.search import SEARCHES
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _json(payload):
+    return {'data': json.dumps(payload), 'content_type': 'application/json'}
+
+
+def _upload(name, lines):
+    return {'data': {'file': SimpleUploadedFile(name, '\n'.join(lines).encode(), content_type='text/csv')}}
+
+
+class Fixture:
+    """Ids and payloads for the scenarios, taken from the seeded data."""
+
+    def __init__(self, image):
+        stats = CustomerStats.objects.order_by('-bill_count', 'customer_id')
+        self.customer_id = (
+            stats.values_list('customer_id', flat=True).first()
+            or Customer.objects.values_list('id', flat=True).first()
+        )
+        self.inventory_id = Inventory.objects.order_by('id').values_list('id', flat=True).first()
+        self.bill_id = Bill.objects.order_by('-date', '-id').values_list('id', flat=True).first()
+        if not (self.customer_id and self.inventory_id and self.bill_id):
+            raise CommandError('Benchmarks need customers, inventory and bills; run manage.py seed_ibms first.')
+
+        # Enough stock that create_bill never runs out, whatever --requests is
+        self.stocked = list(Inventory.objects.order_by('id').values_list('id', 'price')[:3])
+        Inventory.objects.filter(id__in=[id for id, _price in self.stocked]).update(quantity=10 ** 6)
+
+        last_day = timezone.localdate(Bill.objects.get(id=self.bill_id).date)
+        self.last_day = last_day.isoformat()
+        self.recent = (last_day - timedelta(days=6)).isoformat()
+        self.quarter = (last_day - timedelta(days=89)).isoformat()
+        self.search = {
+            'inventory': Inventory.objects.values_list('name', flat=True).first().split()[0],
+            'customers': Customer.objects.values_list('name', flat=True).first().split()[-1],
+        }
+        self.search['bills'] = self.search['customers']
+        self.job_id = enqueue_report().id
+        NotificationSetting.objects.update_or_create(id=1, defaults={'email': 'manager@example.com'})
+        self.image = image
+
+    def disposable_item(self):
+        return Inventory.objects.create(name='Bench disposable', quantity=1, price=1).id
+
+
+# route name -> [(variant, build(fixture, i) -> (method, args, client kwargs))].
+# Routes without an entry are reported as skipped so new ones get noticed.
+SCENARIOS = {
+    'add_inventory': [('', lambda fx, i: ('post', (), _json(
+        {'name': f'Bench item {i}', 'description': 'Benchmark', 'quantity': 10, 'price': '9.99'}
+    )))],
+    'list_inventory': [
+        ('all', lambda fx, i: ('get', (), {})),
+        ('page', lambda fx, i: ('get', (), {'data': {'limit': 50}})),
+    ],
+    'import_inventory': [('csv 50 rows', lambda fx, i: ('post', (), _upload('items.csv', [
+        'sku,name,description,quantity,price',
+        *(f'BENCH-{j},Bench import {j},Imported,{j + 1},{j}.50' for j in range(50)),
+    ])))],
+    'list_customers': [
+        ('all', lambda fx, i: ('get', (), {})),
+        ('page', lambda fx, i: ('get', (), {'data': {'limit': 50}})),
+    ],
+    'add_customer': [('', lambda fx, i: ('post', (), _json(
+        {'name': f'Bench Customer {i}', 'email': f'bench.{i}@example.com', 'phone': f'+1999{i:07d}'}
+    )))],
+    'import_customers': [('csv 50 rows', lambda fx, i: ('post', (), _upload('customers.csv', [
+        'name,email,phone',
+        *(f'Bench Import {j},bench.import.{j}@example.com,+1888{j:07d}' for j in range(50)),
+    ])))],
+    'edit_customer': [('', lambda fx, i: ('post', (fx.customer_id,), _json({'name': f'Bench Edited {i}'})))],
+    'customer_history': [('busiest customer', lambda fx, i: ('get', (fx.customer_id,), {}))],
+    'bill_details': [('', lambda fx, i: ('get', (fx.bill_id,), {}))],
+    'create_bill': [('3 lines', lambda fx, i: ('post', (), _json({
+        'customer_id': fx.customer_id,
+        'items': [{'inventory_id': id, 'quantity': 1, 'price': str(price)} for id, price in fx.stocked],
+    })))],
+    'bill_pdf': [('', lambda fx, i: ('get', (fx.bill_id,), {}))],
+    'list_bills': [
+        ('all', lambda fx, i: ('get', (), {})),
+        ('page', lambda fx, i: ('get', (), {'data': {'limit': 50}})),
+        ('last 7 days', lambda fx, i: ('get', (), {'data': {'start_date': fx.recent}})),
+    ],
+    'search_data': [
+        (entity, lambda fx, i, entity=entity: ('get', (entity,), {'data': {'q': fx.search[entity]}}))
+        for entity in SEARCHES
+    ],
+    'suggest': [('', lambda fx, i: ('get', (), {'data': {'q': fx.search['inventory'][:2]}}))],
+    'sync_changes': [('first page', lambda fx, i: ('get', (), {}))],
+    'export_bill_pdfs': [
+        (f'{fmt} last 7 days', lambda fx, i, fmt=fmt: ('get', (), {'data': {'format': fmt, 'start_date': fx.recent}}))
+        for fmt in ('zip', 'pdf')
+    ],
+    'export_data': [
+        (name, lambda fx, i, name=name: ('get', (name,), {'data': {'format': 'csv'}})) for name in EXPORTS
+    ] + [('inventory ndjson', lambda fx, i: ('get', ('inventory',), {'data': {'format': 'ndjson'}}))],
+    'inventory_detail': [
+        ('get', lambda fx, i: ('get', (fx.inventory_id,), {})),
+        ('put', lambda fx, i: ('put', (fx.inventory_id,), _json({'quantity': 10 ** 6 - i}))),
+        ('delete', lambda fx, i: ('delete', (fx.disposable_item(),), {})),
+    ],
+    'notification_setting': [
+        ('get', lambda fx, i: ('get', (), {})),
+        ('post', lambda fx, i: ('post', (), _json({'email': 'manager@example.com'}))),
+    ],
+    'recognize_item_ai': [('stub api', lambda fx, i: ('post', (), _json({'image': fx.image})))],
+    'recognize_items_ai': [('stub api, 4 images', lambda fx, i: ('post', (), _json({'images': [fx.image] * 4})))],
+    'report_summary': [('', lambda fx, i: ('get', (), {}))],
+    'report_top_products': [('', lambda fx, i: ('get', (), {}))],
+    'report_inventory_status': [('', lambda fx, i: ('get', (), {}))],
+    'report_recent_transactions': [('', lambda fx, i: ('get', (), {}))],
+    'report_sales_trend': [('90 days by week', lambda fx, i: ('get', (), {'data': {
+        'start': fx.quarter, 'end': fx.last_day, 'granularity': 'week',
+    }}))],
+    'report_cache_stats': [('', lambda fx, i: ('get', (), {}))],
+    'report_send_to_manager': [('', lambda fx, i: ('post', (), {}))],
+    'report_job_status': [('', lambda fx, i: ('get', (fx.job_id,), {}))],
+}
+
+
+def percentile(quantiles, p):
+    return round(quantiles[p - 1], 3)
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark every route in inventory/urls.py through the Django test client against the '
+        'current database (see seed_ibms). Reports p50/p95/p99 latency, queries per request and '
+        'peak Python memory per request, and writes the results as JSON for diffing between '
+        'commits. Writes are rolled back afterwards, but their on-commit hooks (cache and '
+        'typeahead invalidation) run after each request as they would on a real commit.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20, help='Timed requests per scenario.')
+        parser.add_argument('--warmup', type=int, default=2, help='Untimed requests per scenario first.')
+        parser.add_argument('--only', action='append', default=[], help='Only routes whose name contains this.')
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Clear the cache before every request. Otherwise report routes measure cache hits.',
+        )
+        parser.add_argument('--output', default='bench_ibms.json', help="JSON results file ('-' for none).")
+        parser.add_argument('--baseline', help='Earlier results file to compare against.')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 2:
+            raise CommandError('--requests must be at least 2 to compute percentiles.')
+        setup_test_environment()
+        self.options = options
+        server = stub_server(0)
+        try:
+            with tempfile.TemporaryDirectory() as pdf_dir, override_settings(
+                CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bench'}},
+                IBMS_PDF_CACHE_DIR=pdf_dir, IBMS_RECOGNITION_CACHE_FILE=None,
+                GEMINI_API_URL=f'http://127.0.0.1:{server.server_address[1]}/', GEMINI_API_KEY='bench',
+                GEMINI_MAX_RETRIES=0,
+            ):
+                with transaction.atomic():
+                    try:
+                        results = self.run_all()
+                    finally:
+                        transaction.set_rollback(True)
+        finally:
+            server.shutdown()
+
+        self.report(results)
+        if options['output'] != '-':
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+                f.write('\n')
+            self.stdout.write(f"Results written to {options['output']}")
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                self.compare(json.load(f), results)
+
+    def run_all(self):
+        fixture = Fixture(json.loads(distinct_images(1)[0])['image'])
+        counts = {
+            'customers': Customer.objects.count(),
+            'inventory': Inventory.objects.count(),
+            'bills': Bill.objects.count(),
+            'bill_items': BillItem.objects.count(),
+        }
+        routes, skipped = {}, []
+        for pattern in urls.urlpatterns:
+            name = pattern.name
+            if self.options['only'] and not any(part in name for part in self.options['only']):
+                continue
+            if name not in SCENARIOS:
+                skipped.append(name)
+                continue
+            for variant, build in SCENARIOS[name]:
+                label = f'{name} [{variant}]' if variant else name
+                routes[label] = self.run_scenario(name, build, fixture)
+        return {
+            'meta': {
+                'commit': self.git_commit(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'rows': counts,
+                'requests': self.options['requests'],
+                'warmup': self.options['warmup'],
+                'cold_cache': self.options['cold'],
+                'max_rss_kib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None,
+            },
+            'routes': routes,
+            'skipped': skipped,
+        }
+
+    def request(self, client, name, build, fixture, i):
+        # Builders may do setup (such as creating a row to delete), so build
+        # before the clock and query capture start.
+        method, args, kwargs = build(fixture, i)
+        path = reverse(name, args=args)
+        if self.options['cold']:
+            cache.clear()
+        with ExitStack() as stack:
+            captures = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in connections]
+            start = time.perf_counter()
+            # Everything runs inside one atomic block that is rolled back, so
+            # on_commit hooks would never fire and report routes would keep
+            # serving entries cached before the writes; run them as a commit would.
+            with TestCase.captureOnCommitCallbacks(execute=True):
+                response = getattr(client, method)(path, **kwargs)
+            body = b''.join(response.streaming_content) if response.streaming else response.content
+            elapsed = time.perf_counter() - start
+        return method, path, response.status_code, len(body), elapsed, sum(len(c) for c in captures)
+
+    def run_scenario(self, name, build, fixture):
+        client = Client()
+        warmup, count = self.options['warmup'], self.options['requests']
+        if not self.options['cold']:
+            # Start from entries built on the current data rather than ones
+            # left by earlier scenarios; the warmup requests rebuild them
+            with TestCase.captureOnCommitCallbacks(execute=True):
+                bump_data_generation()
+        # i numbers every request of the scenario, so payloads can stay unique
+        for i in range(warmup):
+            self.request(client, name, build, fixture, i)
+        timings, queries, statuses = [], [], set()
+        for i in range(warmup, warmup + count):
+            method, path, status, size, elapsed, query_count = self.request(client, name, build, fixture, i)
+            timings.append(elapsed * 1000)
+            queries.append(query_count)
+            statuses.add(status)
+
+        # One more request under tracemalloc, which would distort the timings above
+        tracemalloc.start()
+        try:
+            self.request(client, name, build, fixture, warmup + count)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        quantiles = statistics.quantiles(timings, n=100, method='inclusive')
+        return {
+            'method': method.upper(),
+            'path': path,
+            'status': sorted(statuses),
+            'bytes': size,
+            'p50_ms': percentile(quantiles, 50),
+            'p95_ms': percentile(quantiles, 95),
+            'p99_ms': percentile(quantiles, 99),
+            'queries': max(queries),
+            'peak_kib': round(peak / 1024, 1),
+        }
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def report(self, results):
+        self.stdout.write(
+            f"{'route':<42} {'status':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8} {'peak KiB':>10}"
+        )
+        for label, row in results['routes'].items():
+            status = ','.join(str(s) for s in row['status'])
+            self.stdout.write(
+                f"{label:<42} {status:>9} {row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} {row['p99_ms']:>9.2f} "
+                f"{row['queries']:>8} {row['peak_kib']:>10.1f}"
+            )
+        if results['skipped']:
+            self.stdout.write(self.style.WARNING(f"No scenario for: {', '.join(results['skipped'])}"))
+
+    def compare(self, baseline, results):
+        self.stdout.write(f"\nAgainst {baseline['meta'].get('commit') or 'baseline'}:")
+        for label, row in results['routes'].items():
+            before = baseline['routes'].get(label)
+            if before is None:
+                self.stdout.write(f'{label:<42} new')
+                continue
+            ratio = row['p50_ms'] / before['p50_ms'] if before['p50_ms'] else float('inf')
+            queries = row['queries'] - before['queries']
+            line = f'{label:<42} p50 {ratio:6.2f}x  queries {queries:+d}'
+            slower = ratio > 1.2 or queries > 0
+            self.stdout.write(self.style.WARNING(line) if slower else line)
@@ -0,0 +1,79 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.decorators import api_view, renderer_classes
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+
+from inventory.models import Inventory
+from inventory.views import list_inventory
+
+
+@api_view(['GET'])
+@renderer_classes([JSONRenderer])
+def legacy_list_inventory(request):
+    # list_inventory as it was before the projection layer: model
+    # instances, hand-built dicts and DRF's stock JSON renderer.
+    items = Inventory.objects.all().order_by('-created_at')
+    data = [
+        {
+            'id': item.id,
+            'name': item.name,
+            'description': item.description,
+            'quantity': item.quantity,
+            'price': str(item.price),
+            'created_at': item.created_at,
+            'updated_at': item.updated_at,
+        }
+        for item in items
+    ]
+    return Response(data)
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the CPU time of list_inventory against the pre-projection implementation '
+        'on a temporary catalog, and check that both return identical bytes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            # Rows exist only inside this transaction
+            Inventory.objects.bulk_create([
+                Inventory(
+                    name=f'Item {i} – ünïcode', description=f'Part number {i}\nline two',
+                    quantity=i % 100, price=Decimal(i % 5000) / 4,
+                )
+                for i in range(options['rows'])
+            ], batch_size=2000)
+            try:
+                self.compare(options['repeat'])
+            finally:
+                transaction.set_rollback(True)
+
+    def compare(self, repeat):
+        factory = APIRequestFactory()
+        results = {}
+        for label, view in (('before', legacy_list_inventory), ('after', list_inventory)):
+            best = None
+            for _ in range(repeat):
+                request = factory.get('/api/inventory/list/', HTTP_ACCEPT='application/json')
+                start = time.process_time()
+                body = view(request).render().content
+                elapsed = time.process_time() - start
+                best = elapsed if best is None else min(best, elapsed)
+            results[label] = (best, body)
+            self.stdout.write(f'{label:>6}: {best * 1000:8.1f} ms CPU, {len(body)} bytes')
+        if results['before'][1] != results['after'][1]:
+            raise CommandError('Responses differ between the two implementations.')
+        before, after = results['before'][0], results['after'][0]
+        self.stdout.write(self.style.SUCCESS(
+            f'Identical output; CPU time reduced by {(1 - after / before) * 100:.0f}% ({before / after:.1f}x).'
+        ))
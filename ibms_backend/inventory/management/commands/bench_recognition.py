@@ -0,0 +1,127 @@
+import asyncio
+import base64
+import io
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings, setup_test_environment
+from PIL import Image
+
+from inventory import gemini
+
+URL = '/api/inventory/ai/recognize-item/'
+
+
+def stub_server(delay):
+    """
+    Local stand-in for the Gemini API that answers after `delay` seconds.
+    server.peak records the most calls it had in flight at once.
+    """
+    body = json.dumps({
+        'candidates': [{'content': {'parts': [{'text': '{"name": "Stub item", "description": "From the stub"}'}]}}]
+    }).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            with server.lock:
+                server.in_flight += 1
+                server.peak = max(server.peak, server.in_flight)
+            time.sleep(delay)
+            with server.lock:
+                server.in_flight -= 1
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.in_flight = server.peak = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def distinct_images(count):
+    # Random noise so no two images land in the same recognition cache slot
+    images = []
+    for _ in range(count):
+        buffer = io.BytesIO()
+        Image.effect_noise((64, 64), 64).convert('RGB').save(buffer, 'JPEG')
+        images.append(json.dumps({'image': base64.b64encode(buffer.getvalue()).decode()}))
+    return images
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare recognize_item_ai throughput when served like WSGI does it (a fixed pool of '
+        'worker threads, each running the async view to completion through async_to_sync) '
+        'and like ASGI does it (all requests on one event loop), against a local stub that '
+        'delays every vision API call. Both runs share the process-wide Gemini client, so '
+        'the peak number of upstream calls shows its concurrency cap.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--delay', type=float, default=0.5, help='Stub upstream latency in seconds.')
+        parser.add_argument('--threads', type=int, default=4, help='Worker threads for the WSGI run.')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        count = options['requests']
+        server = stub_server(options['delay'])
+        url = f'http://127.0.0.1:{server.server_address[1]}/'
+        try:
+            with override_settings(GEMINI_API_URL=url, GEMINI_API_KEY='bench', GEMINI_MAX_RETRIES=0,
+                                   GEMINI_READ_TIMEOUT=options['delay'] + 30):
+                # The shared client reads these settings once
+                gemini._client = None
+                wsgi = self.run_wsgi(distinct_images(count), options['threads'])
+                wsgi_peak, server.peak = server.peak, 0
+                asgi = asyncio.run(self.run_asgi(distinct_images(count)))
+                asgi_peak = server.peak
+        finally:
+            server.shutdown()
+            if gemini._client is not None:
+                gemini._client.close()
+                gemini._client = None
+
+        for label, (elapsed, statuses), peak in (
+            (f"WSGI, {options['threads']} threads", wsgi, wsgi_peak),
+            ('ASGI, 1 event loop', asgi, asgi_peak),
+        ):
+            ok = statuses.count(200)
+            self.stdout.write(
+                f'{label:<22} {elapsed:7.2f}s  {count / elapsed:7.1f} req/s  {ok}/{count} ok  '
+                f'peak upstream calls {peak}'
+            )
+        self.stdout.write(self.style.SUCCESS(f'ASGI speedup: {wsgi[0] / asgi[0]:.1f}x'))
+
+    def run_wsgi(self, bodies, threads):
+        local = threading.local()
+
+        def post(body):
+            if not hasattr(local, 'client'):
+                local.client = Client()
+            return local.client.post(URL, body, content_type='application/json').status_code
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            statuses = list(executor.map(post, bodies))
+        return time.perf_counter() - start, statuses
+
+    async def run_asgi(self, bodies):
+        client = AsyncClient()
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(client.post(URL, body, content_type='application/json') for body in bodies))
+        return time.perf_counter() - start, [r.status_code for r in responses]
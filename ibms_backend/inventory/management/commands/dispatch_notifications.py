@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from inventory.notifications import MAX_ATTEMPTS, TwilioSender, dispatch_pending
+
+
+class Command(BaseCommand):
+    help = 'Deliver pending low stock alerts from the notification outbox.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS)
+        parser.add_argument('--loop', action='store_true', help='Keep polling the outbox instead of exiting when it is empty.')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to sleep between polls when the outbox is empty.')
+
+    def handle(self, *args, **options):
+        sms_sender = TwilioSender()
+        while True:
+            counts = dispatch_pending(
+                batch_size=options['batch_size'],
+                max_attempts=options['max_attempts'],
+                sms_sender=sms_sender,
+            )
+            processed = sum(counts.values())
+            if processed:
+                self.stdout.write(
+                    f"sent={counts['sent']} retried={counts['retried']} failed={counts['failed']}"
+                )
+            if processed < options['batch_size']:
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
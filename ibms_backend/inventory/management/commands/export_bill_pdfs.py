@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.bulk_pdfs import TooManyBills, check_combined_size, iter_combined_pdf, iter_zip
+from inventory.filters import InvalidFilter, parse_bill_filters
+
+
+class Command(BaseCommand):
+    help = 'Export the PDFs of all bills matching the list_bills filters as a ZIP or one combined PDF.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='File to write the archive to.')
+        parser.add_argument('--start-date')
+        parser.add_argument('--end-date')
+        parser.add_argument('--search', default='')
+        parser.add_argument('--format', choices=['zip', 'pdf'], default='zip')
+        parser.add_argument('--workers', type=int, help='Rendering processes for ZIP exports.')
+
+    def handle(self, *args, **options):
+        params = {
+            'search': options['search'],
+            'start_date': options['start_date'],
+            'end_date': options['end_date'],
+        }
+        try:
+            parse_bill_filters(params)
+        except InvalidFilter as e:
+            raise CommandError(str(e))
+        if options['format'] == 'zip':
+            chunks = iter_zip(params, workers=options['workers'])
+        else:
+            try:
+                check_combined_size(params)
+            except TooManyBills as e:
+                raise CommandError(str(e))
+            chunks = iter_combined_pdf(params)
+        size = 0
+        with open(options['output'], 'wb') as f:
+            for data in chunks:
+                f.write(data)
+                size += len(data)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {size} bytes to {options['output']}"))
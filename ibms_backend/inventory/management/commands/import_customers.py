@@ -0,0 +1,31 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.imports import CHUNK_SIZE, ON_EXISTING, READERS, detect_format, import_customers
+
+
+class Command(BaseCommand):
+    help = 'Bulk import customers from a CSV, JSON array or NDJSON file, deduplicated on email and phone.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=sorted(READERS), help='Defaults to the file extension.')
+        parser.add_argument('--on-existing', choices=ON_EXISTING, default='skip',
+                            help='What to do with rows matching an existing customer.')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or detect_format(options['path'])
+        if fmt not in READERS:
+            raise CommandError('Cannot tell the file format; pass --format.')
+        with open(options['path'], 'rb') as f:
+            result = import_customers(
+                READERS[fmt](f), on_existing=options['on_existing'], chunk_size=options['chunk_size'],
+            )
+        for error in result.errors:
+            self.stderr.write(json.dumps(error))
+        self.stdout.write(self.style.SUCCESS(
+            f'{result.rows} rows: {result.inserted} inserted, {result.updated} updated, '
+            f'{result.skipped} skipped, {result.conflicts} conflicts, {result.failed} failed'
+        ))
@@ -0,0 +1,26 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.imports import CHUNK_SIZE, READERS, detect_format, import_inventory
+
+
+class Command(BaseCommand):
+    help = 'Bulk import or update inventory items from a CSV, JSON array or NDJSON file, keyed by SKU.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=sorted(READERS), help='Defaults to the file extension.')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or detect_format(options['path'])
+        if fmt not in READERS:
+            raise CommandError('Cannot tell the file format; pass --format.')
+        with open(options['path'], 'rb') as f:
+            result = import_inventory(READERS[fmt](f), chunk_size=options['chunk_size'])
+        for error in result.errors:
+            self.stderr.write(json.dumps(error))
+        self.stdout.write(self.style.SUCCESS(
+            f'{result.rows} rows: {result.inserted} inserted, {result.updated} updated, {result.failed} failed'
+        ))
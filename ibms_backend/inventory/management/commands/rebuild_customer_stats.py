@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.rollups import rebuild_customer_stats, verify_customer_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild or verify the per-customer lifetime stats from the bill table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true', help='Only compare the stats with the raw data.')
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            problems = verify_customer_stats()
+            for problem in problems:
+                self.stdout.write(problem)
+            if problems:
+                raise CommandError(f'{len(problems)} customers have stats that do not match their bills.')
+            self.stdout.write(self.style.SUCCESS('Customer stats match the bill data.'))
+            return
+        count = rebuild_customer_stats()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt stats for {count} customers.'))
@@ -0,0 +1,27 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.rollups import rebuild_rollups, verify_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild or verify the daily sales rollups from the raw bill tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, help='First day to rebuild (YYYY-MM-DD).')
+        parser.add_argument('--end', type=date.fromisoformat, help='Last day to rebuild (YYYY-MM-DD).')
+        parser.add_argument('--verify', action='store_true', help='Only compare the rollups with the raw data.')
+
+    def handle(self, *args, **options):
+        start, end = options['start'], options['end']
+        if options['verify']:
+            problems = verify_rollups(start, end)
+            for problem in problems:
+                self.stdout.write(problem)
+            if problems:
+                raise CommandError(f'{len(problems)} rollup rows do not match the bill data.')
+            self.stdout.write(self.style.SUCCESS('Rollups match the bill data.'))
+            return
+        days, products = rebuild_rollups(start, end)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {days} daily rows and {products} product rows.'))
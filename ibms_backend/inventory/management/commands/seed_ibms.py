@@ -0,0 +1,188 @@
+import bisect
+import itertools
+import random
+import time
+from datetime import date, datetime, time as dt_time, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from inventory.cache import bump_data_generation
+from inventory.models import (
+    Bill, BillItem, Customer, CustomerStats, DailyProductSales, DailySales, Inventory, Tombstone,
+)
+from inventory.rollups import rebuild_customer_stats, rebuild_rollups
+from inventory.typeahead import invalidate_typeahead
+
+FIRST_NAMES = [
+    'Aarav', 'Amelia', 'Ana', 'Chen', 'David', 'Elena', 'Fatima', 'Grace', 'Hiro', 'Ines',
+    'James', 'Kofi', 'Lucia', 'Maya', 'Noah', 'Olga', 'Priya', 'Rahul', 'Sofia', 'Yusuf',
+]
+LAST_NAMES = [
+    'Ahmed', 'Brown', 'Costa', 'Das', 'Fischer', 'Garcia', 'Ito', 'Kim', 'Kowalski', 'Li',
+    'Mensah', 'Müller', 'Nair', 'Okafor', 'Patel', 'Rossi', 'Sharma', 'Silva', 'Smith', 'Wang',
+]
+ADJECTIVES = [
+    'Basic', 'Compact', 'Deluxe', 'Eco', 'Heavy', 'Large', 'Mini', 'Organic', 'Premium', 'Pro',
+    'Small', 'Smart', 'Steel', 'Travel', 'Wireless',
+]
+PRODUCTS = [
+    'Battery', 'Bottle', 'Cable', 'Charger', 'Cup', 'Fan', 'Kettle', 'Lamp', 'Mouse', 'Notebook',
+    'Pen', 'Rice 5kg', 'Soap', 'Speaker', 'Tea', 'Towel', 'Umbrella',
+]
+# Units bought per line: mostly one or two
+LINE_QUANTITIES = [1, 2, 3, 4, 5, 10]
+LINE_QUANTITY_WEIGHTS = [50, 25, 10, 7, 5, 3]
+
+
+def zipf_weights(count, skew):
+    """Cumulative weights where the k-th most popular item has weight 1 / k**skew."""
+    return list(itertools.accumulate(1 / (rank ** skew) for rank in range(1, count + 1)))
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill the database with a reproducible synthetic dataset: customers, inventory items, '
+        'and bills over a date range with Zipf-skewed item popularity. The same options and '
+        '--seed always produce the same rows.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=1000)
+        parser.add_argument('--items', type=int, default=500)
+        parser.add_argument('--bills', type=int, default=20000)
+        parser.add_argument('--max-lines', type=int, default=5, help='Most line items on one bill.')
+        parser.add_argument('--days', type=int, default=180, help='Spread the bills over this many days.')
+        parser.add_argument(
+            '--end', type=date.fromisoformat,
+            help='Last day with bills (YYYY-MM-DD). Defaults to today; pin it for identical datasets.',
+        )
+        parser.add_argument('--skew', type=float, default=1.1, help='Zipf exponent for item popularity; 0 is uniform.')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--clear', action='store_true', help='Delete existing customers, items and bills first.')
+
+    def handle(self, *args, **options):
+        if min(options['customers'], options['items'], options['max_lines'], options['days']) < 1:
+            raise CommandError('--customers, --items, --max-lines and --days must be at least 1.')
+        if options['bills'] < 0 or options['batch_size'] < 1:
+            raise CommandError('--bills must not be negative and --batch-size must be positive.')
+        if not options['clear'] and (Customer.objects.exists() or Inventory.objects.exists()):
+            raise CommandError('The database already has customers or inventory; pass --clear to replace them.')
+
+        rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        start = time.perf_counter()
+        with transaction.atomic():
+            if options['clear']:
+                self.clear()
+            customer_ids = self.seed_customers(rng, options['customers'])
+            items = self.seed_items(rng, options['items'])
+            bill_count, line_count = self.seed_bills(rng, customer_ids, items, options)
+            # bulk_create skips the per-bill bookkeeping, so rebuild it in one pass
+            rebuild_rollups()
+            rebuild_customer_stats()
+        invalidate_typeahead()
+        bump_data_generation()
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(customer_ids)} customers, {len(items)} items and {bill_count} bills '
+            f'({line_count} line items) in {time.perf_counter() - start:.1f}s.'
+        ))
+
+    def clear(self):
+        for model in (BillItem, Bill, CustomerStats, DailyProductSales, DailySales, Inventory, Customer, Tombstone):
+            model.objects.all().delete()
+
+    def seed_customers(self, rng, count):
+        def rows():
+            for i in range(count):
+                first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                yield Customer(
+                    name=f'{first} {last}',
+                    email=f'{first.lower()}.{i}@example.com',
+                    phone=f'+1555{i:07d}',
+                )
+
+        ids = []
+        for batch in batched(rows(), self.batch_size):
+            ids.extend(customer.id for customer in Customer.objects.bulk_create(batch))
+        return ids
+
+    def seed_items(self, rng, count):
+        def rows():
+            for i in range(count):
+                # Roughly log-normal prices with a long tail, and a few items nearly out of stock
+                price = Decimal(str(min(max(rng.lognormvariate(2.5, 1.0), 0.5), 5000))).quantize(Decimal('0.01'))
+                quantity = rng.randint(0, 5) if rng.random() < 0.05 else rng.randint(20, 1000)
+                yield Inventory(
+                    sku=f'SEED-{i:06d}',
+                    name=f'{rng.choice(ADJECTIVES)} {rng.choice(PRODUCTS)} {i}',
+                    description=f'Synthetic item {i}',
+                    quantity=quantity,
+                    price=price,
+                )
+
+        items = []
+        for batch in batched(rows(), self.batch_size):
+            items.extend(Inventory.objects.bulk_create(batch))
+        return items
+
+    def seed_bills(self, rng, customer_ids, items, options):
+        # Popularity follows item rank in a shuffled order, so the best sellers
+        # are not simply the lowest ids
+        ranked = items[:]
+        rng.shuffle(ranked)
+        cum_weights = zipf_weights(len(ranked), options['skew'])
+        max_lines = min(options['max_lines'], len(ranked))
+
+        end = timezone.make_aware(datetime.combine(
+            (options['end'] or timezone.localdate()) + timedelta(days=1), dt_time.min,
+        ))
+        span = options['days'] * 86400
+        # Bill ids increase with their date, as they would in production
+        offsets = sorted(rng.random() * span for _ in range(options['bills']))
+
+        bill_count = line_count = 0
+        for batch in batched(offsets, self.batch_size):
+            bills, lines = [], []
+            for offset in batch:
+                chosen = {}
+                wanted = rng.randint(1, max_lines)
+                while len(chosen) < wanted:
+                    item = ranked[bisect.bisect_left(cum_weights, rng.random() * cum_weights[-1])]
+                    chosen[item.id] = item
+                bill_lines = [
+                    (item, rng.choices(LINE_QUANTITIES, LINE_QUANTITY_WEIGHTS)[0]) for item in chosen.values()
+                ]
+                bill = Bill(
+                    customer_id=rng.choice(customer_ids),
+                    date=end - timedelta(seconds=span - offset),
+                    total=sum(item.price * qty for item, qty in bill_lines),
+                )
+                bills.append(bill)
+                lines.append(bill_lines)
+
+            # Bill.date is auto_now_add, which bulk_create overwrites with now()
+            dates = [bill.date for bill in bills]
+            Bill.objects.bulk_create(bills)
+            for bill, stamp in zip(bills, dates):
+                bill.date = stamp
+            Bill.objects.bulk_update(bills, ['date'])
+
+            bill_items = [
+                BillItem(bill_id=bill.id, inventory_id=item.id, name=item.name, quantity=qty, price=item.price)
+                for bill, bill_lines in zip(bills, lines)
+                for item, qty in bill_lines
+            ]
+            BillItem.objects.bulk_create(bill_items, batch_size=self.batch_size)
+            bill_count += len(bills)
+            line_count += len(bill_items)
+        return bill_count, line_count
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from inventory.manager_report import enqueue_report, run_queued_jobs
+from inventory.models import ReportJob
+
+
+class Command(BaseCommand):
+    help = (
+        'Build and email the manager report. Without options a new scheduled run is queued '
+        'and executed, so a daily or weekly cron entry is enough; --queued-only just works '
+        'off runs requested through the API.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queued-only', action='store_true', help='Only process jobs queued through the API.')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for queued jobs.')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds between polls with --loop.')
+
+    def handle(self, *args, **options):
+        if not options['queued_only']:
+            enqueue_report(trigger=ReportJob.TRIGGER_SCHEDULE)
+        while True:
+            for job in run_queued_jobs():
+                if job.status == ReportJob.STATUS_DONE:
+                    self.stdout.write(self.style.SUCCESS(f'Job #{job.id} sent to {job.recipient}'))
+                else:
+                    self.stderr.write(f'Job #{job.id} failed: {job.error}')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
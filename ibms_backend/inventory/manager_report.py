@@ -0,0 +1,203 @@
+from datetime import timedelta
+import io
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+from .models import Inventory, NotificationSetting, ReportJob
+from .reports import sales_summary, sales_trend, top_products
+
+# Claims of a job (including ones reclaimed from dead workers) before it is failed
+MAX_ATTEMPTS = 3
+
+
+def build_report_data(trend_days=30):
+    """Everything shown in the manager report, as plain Python values."""
+    summary = sales_summary()
+    # Sales trend for top day/month over the last trend_days days
+    today = timezone.localdate()
+    start = today - timedelta(days=trend_days - 1)
+    trend = sales_trend(start, today, 'day')
+    months = sales_trend(start, today, 'month')
+    top_day = max(trend, key=lambda x: x['sales']) if trend else None
+    top_month = max(months, key=lambda x: x['sales']) if months else None
+    return {
+        'total_sales': summary['total_sales'],
+        'transactions': summary['transactions'],
+        'avg_bill': summary['avg_bill'],
+        'low_stock_items': [
+            {'name': name, 'stock': stock}
+            for name, stock in Inventory.objects.filter(quantity__lt=2).values_list('name', 'quantity')
+        ],
+        'top_products': top_products(10),
+        'top_day': top_day,
+        'top_month': {'month': top_month['date'][:7], 'sales': top_month['sales']} if top_month else None,
+    }
+
+
+def render_report_pdf(data):
+    buffer = io.BytesIO()
+    p = canvas.Canvas(buffer, pagesize=letter)
+    width, height = letter
+    y = height - 50
+
+    p.setFont("Helvetica-Bold", 16)
+    p.drawString(50, y, "Report Summary")
+    y -= 30
+
+    p.setFont("Helvetica", 12)
+    p.drawString(50, y, f"Total Sales: {data['total_sales']}")
+    y -= 20
+    p.drawString(50, y, f"Total Transactions: {data['transactions']}")
+    y -= 20
+    p.drawString(50, y, f"Average Bill: {data['avg_bill']}")
+    y -= 30
+
+    p.setFont("Helvetica-Bold", 12)
+    p.drawString(50, y, "Low Stock Items:")
+    y -= 18
+    p.setFont("Helvetica", 11)
+    if data['low_stock_items']:
+        p.drawString(60, y, "Product Name           Stock")
+        y -= 15
+        for item in data['low_stock_items']:
+            p.drawString(60, y, f"{item['name']:20} {item['stock']}")
+            y -= 15
+    else:
+        p.drawString(60, y, "None")
+        y -= 15
+    y -= 10
+
+    p.setFont("Helvetica-Bold", 12)
+    p.drawString(50, y, "Top Selling Products:")
+    y -= 18
+    p.setFont("Helvetica", 11)
+    if data['top_products']:
+        p.drawString(60, y, "Product Name           Units Sold   Revenue")
+        y -= 15
+        for prod in data['top_products']:
+            p.drawString(60, y, f"{prod['name']:20} {prod['units_sold']:10}   {prod['revenue']}")
+            y -= 15
+    else:
+        p.drawString(60, y, "None")
+        y -= 15
+    y -= 10
+
+    p.setFont("Helvetica-Bold", 12)
+    p.drawString(50, y, "Top Selling Day:")
+    y -= 18
+    p.setFont("Helvetica", 11)
+    if data['top_day']:
+        p.drawString(60, y, f"{data['top_day']['date']} (Sales: {data['top_day']['sales']})")
+        y -= 15
+    else:
+        p.drawString(60, y, "N/A")
+        y -= 15
+    y -= 10
+
+    p.setFont("Helvetica-Bold", 12)
+    p.drawString(50, y, "Top Selling Month:")
+    y -= 18
+    p.setFont("Helvetica", 11)
+    if data['top_month']:
+        p.drawString(60, y, f"{data['top_month']['month']} (Sales: {data['top_month']['sales']})")
+        y -= 15
+    else:
+        p.drawString(60, y, "N/A")
+        y -= 15
+    y -= 20
+
+    p.setFont("Helvetica-Oblique", 10)
+    p.drawString(50, y, "Generated by IBMS System")
+    p.save()
+
+    return buffer.getvalue()
+
+
+def build_report_email(data, recipient, connection=None):
+    email = EmailMessage(
+        subject=' Report Summary',
+        body='Please find the attached PDF report.',
+        from_email='noreply@example.com',
+        to=[recipient],
+        connection=connection,
+    )
+    email.attach('report_summary.pdf', render_report_pdf(data), 'application/pdf')
+    return email
+
+
+def enqueue_report(trigger=ReportJob.TRIGGER_REQUEST):
+    return ReportJob.objects.create(trigger=trigger)
+
+
+def claim_next_job(stale_after=None):
+    """
+    Claim the oldest queued job, or a running job that was started more
+    than stale_after seconds ago (settings.IBMS_REPORT_JOB_TIMEOUT by
+    default): its worker is assumed to have died. Jobs claimed
+    MAX_ATTEMPTS times are marked failed instead of being run again.
+    """
+    if stale_after is None:
+        stale_after = settings.IBMS_REPORT_JOB_TIMEOUT
+    stale = timezone.now() - timedelta(seconds=stale_after)
+    with transaction.atomic():
+        while True:
+            job = (
+                ReportJob.objects.select_for_update(skip_locked=True)
+                .filter(
+                    Q(status=ReportJob.STATUS_QUEUED)
+                    | Q(status=ReportJob.STATUS_RUNNING, started_at__lt=stale)
+                )
+                .order_by('created_at', 'id')
+                .first()
+            )
+            if job is None:
+                return None
+            if job.attempts >= MAX_ATTEMPTS:
+                job.status = ReportJob.STATUS_FAILED
+                job.error = f'Gave up after {job.attempts} attempts; the worker stopped before finishing.'
+                job.finished_at = timezone.now()
+                job.save(update_fields=['status', 'error', 'finished_at'])
+                continue
+            job.status = ReportJob.STATUS_RUNNING
+            job.started_at = timezone.now()
+            job.attempts += 1
+            job.save(update_fields=['status', 'started_at', 'attempts'])
+            return job
+
+
+def run_job(job, connection=None):
+    """
+    Build, render and email the report for a claimed job, recording the
+    outcome on the job. Pass a locmem or dummy email connection to run it
+    without SMTP.
+    """
+    try:
+        setting = NotificationSetting.objects.first()
+        if not setting or not setting.email:
+            raise ValueError('Manager email not set.')
+        job.recipient = setting.email
+        build_report_email(build_report_data(), setting.email, connection).send(fail_silently=False)
+    except Exception as e:
+        job.status = ReportJob.STATUS_FAILED
+        job.error = str(e)
+    else:
+        job.status = ReportJob.STATUS_DONE
+        job.error = ''
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'recipient', 'error', 'finished_at'])
+    return job
+
+
+def run_queued_jobs(connection=None):
+    jobs = []
+    while True:
+        job = claim_next_job()
+        if job is None:
+            return jobs
+        jobs.append(run_job(job, connection))
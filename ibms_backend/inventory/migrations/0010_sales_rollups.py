@@ -0,0 +1,62 @@
+# Generated by Django 5.2.3 on 2026-10-18 17:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def backfill_rollups(apps, schema_editor):
+    Bill = apps.get_model('inventory', 'Bill')
+    BillItem = apps.get_model('inventory', 'BillItem')
+    DailySales = apps.get_model('inventory', 'DailySales')
+    DailyProductSales = apps.get_model('inventory', 'DailyProductSales')
+    tz = timezone.get_current_timezone()
+    DailySales.objects.bulk_create([
+        DailySales(day=row['day'], total=row['total'], bill_count=row['bill_count'])
+        for row in Bill.objects.annotate(day=TruncDate('date', tzinfo=tz)).values('day')
+        .annotate(total=Sum('total'), bill_count=Count('id'))
+    ], batch_size=1000)
+    DailyProductSales.objects.bulk_create([
+        DailyProductSales(day=row['day'], inventory_id=row['inventory_id'], units=row['units'], revenue=row['revenue'])
+        for row in BillItem.objects.annotate(day=TruncDate('bill__date', tzinfo=tz)).values('day', 'inventory_id')
+        .annotate(units=Sum('quantity'), revenue=Sum(F('quantity') * F('price')))
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('bill_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Daily sales',
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyProductSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('inventory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='inventory.inventory')),
+            ],
+            options={
+                'verbose_name_plural': 'Daily product sales',
+                'constraints': [models.UniqueConstraint(fields=('day', 'inventory'), name='unique_daily_product_sales')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 17:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0011_reportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventory',
+            name='sku',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,45 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# Trigram GIN indexes backing inventory.search. They index UPPER(column)
+# because that is what icontains-style matching and the search module
+# compare against; pg_trgm similarity is case-insensitive either way.
+# The indexes are Postgres-only, so they are created with SQL here and
+# kept out of the model state; on other databases this is a no-op.
+INDEXES = [
+    ('inventory_customer_name_trgm', 'inventory_customer', 'name'),
+    ('inventory_customer_phone_trgm', 'inventory_customer', 'phone'),
+    ('inventory_inventory_name_trgm', 'inventory_inventory', 'name'),
+    ('inventory_inventory_description_trgm', 'inventory_inventory', 'description'),
+]
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} USING gin (UPPER({column}) gin_trgm_ops)'
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _table, _column in INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('inventory', '0012_inventory_sku'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
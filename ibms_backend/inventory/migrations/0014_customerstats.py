@@ -0,0 +1,47 @@
+# Generated by Django 5.2.3 on 2026-10-18 17:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+
+
+def backfill_customer_stats(apps, schema_editor):
+    Bill = apps.get_model('inventory', 'Bill')
+    CustomerStats = apps.get_model('inventory', 'CustomerStats')
+    CustomerStats.objects.bulk_create([
+        CustomerStats(
+            customer_id=row['customer_id'], bill_count=row['bill_count'], lifetime_spend=row['spend'],
+            first_purchase_at=row['first'], last_purchase_at=row['last'],
+        )
+        for row in Bill.objects.values('customer_id').annotate(
+            bill_count=Count('id'), spend=Sum('total'), first=Min('date'), last=Max('date'),
+        )
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0013_search_trgm_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerStats',
+            fields=[
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='inventory.customer')),
+                ('bill_count', models.PositiveIntegerField(default=0)),
+                ('lifetime_spend', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('first_purchase_at', models.DateTimeField(blank=True, null=True)),
+                ('last_purchase_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Customer stats',
+            },
+        ),
+        migrations.RunPython(backfill_customer_stats, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(fields=['customer', 'date', 'id'], name='inventory_b_custome_b22306_idx'),
+        ),
+    ]
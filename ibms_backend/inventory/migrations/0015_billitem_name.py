@@ -0,0 +1,29 @@
+# Generated by Django 5.2.3 on 2026-10-18 17:19
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_item_names(apps, schema_editor):
+    # Older bills get the current inventory name, the best snapshot left
+    BillItem = apps.get_model('inventory', 'BillItem')
+    Inventory = apps.get_model('inventory', 'Inventory')
+    BillItem.objects.update(
+        name=Subquery(Inventory.objects.filter(id=OuterRef('inventory_id')).values('name')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0014_customerstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='billitem',
+            name='name',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.RunPython(backfill_item_names, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,7 @@
+from decimal import Decimal
+
 from django.db import models
+from django.utils import timezone
 
 # Create your models here.
 
@@ -12,7 +15,14 @@ class Customer(models.Model):
     def __str__(self):
         return self.name
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['name', 'id']),
+            models.Index(fields=['updated_at', 'id']),
+        ]
+
 class Inventory(models.Model):
+    sku = models.CharField(max_length=64, unique=True, blank=True, null=True)
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
     quantity = models.PositiveIntegerField()
@@ -24,6 +34,12 @@ class Inventory(models.Model):
     def __str__(self):
         return self.name
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['updated_at', 'id']),
+        ]
+
 class Bill(models.Model):
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='bills')
     date = models.DateTimeField(auto_now_add=True)
@@ -32,14 +48,22 @@ class Bill(models.Model):
     def __str__(self):
         return f"Bill #{self.id} - {self.customer.name}"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'id']),
+            models.Index(fields=['customer', 'date', 'id']),
+        ]
+
 class BillItem(models.Model):
     bill = models.ForeignKey(Bill, on_delete=models.CASCADE, related_name='items')
     inventory = models.ForeignKey(Inventory, on_delete=models.PROTECT)
+    # Item name at the time of sale; price is already the sale-time unit price
+    name = models.CharField(max_length=100, blank=True, default='')
     quantity = models.PositiveIntegerField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
 
     def __str__(self):
-        return f"{self.inventory.name} x {self.quantity}"
+        return f"{self.name} x {self.quantity}"
 
 class NotificationSetting(models.Model):
     phone_number = models.CharField(max_length=20, blank=True, null=True)
@@ -51,3 +75,145 @@ class NotificationSetting(models.Model):
     class Meta:
         verbose_name = "Notification Setting"
         verbose_name_plural = "Notification Settings"
+
+class OutboxMessage(models.Model):
+    CHANNEL_EMAIL = 'email'
+    CHANNEL_SMS = 'sms'
+    CHANNEL_CHOICES = [
+        (CHANNEL_EMAIL, 'Email'),
+        (CHANNEL_SMS, 'SMS'),
+    ]
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES)
+    recipient = models.CharField(max_length=254)
+    subject = models.CharField(max_length=200, blank=True)
+    body = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.channel} to {self.recipient} ({self.status})"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+class DailySales(models.Model):
+    day = models.DateField(unique=True)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    bill_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.day}: {self.total} ({self.bill_count} bills)"
+
+    class Meta:
+        verbose_name_plural = "Daily sales"
+
+class DailyProductSales(models.Model):
+    day = models.DateField()
+    inventory = models.ForeignKey(Inventory, on_delete=models.CASCADE, related_name='daily_sales')
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.day}: {self.inventory_id} x {self.units}"
+
+    class Meta:
+        verbose_name_plural = "Daily product sales"
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'inventory'], name='unique_daily_product_sales'),
+        ]
+
+class CustomerStats(models.Model):
+    customer = models.OneToOneField(Customer, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    bill_count = models.PositiveIntegerField(default=0)
+    lifetime_spend = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    first_purchase_at = models.DateTimeField(null=True, blank=True)
+    last_purchase_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.customer_id}: {self.lifetime_spend} ({self.bill_count} bills)"
+
+    @property
+    def average_basket(self):
+        if not self.bill_count:
+            return Decimal('0.00')
+        return (self.lifetime_spend / self.bill_count).quantize(Decimal('0.01'))
+
+    class Meta:
+        verbose_name_plural = "Customer stats"
+
+class ReportJob(models.Model):
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    TRIGGER_REQUEST = 'request'
+    TRIGGER_SCHEDULE = 'schedule'
+    TRIGGER_CHOICES = [
+        (TRIGGER_REQUEST, 'Request'),
+        (TRIGGER_SCHEDULE, 'Schedule'),
+    ]
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    trigger = models.CharField(max_length=10, choices=TRIGGER_CHOICES, default=TRIGGER_REQUEST)
+    # Times a worker claimed the job; more than one means a worker died mid-run
+    attempts = models.PositiveIntegerField(default=0)
+    recipient = models.EmailField(blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Report job #{self.id} ({self.status})"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+class Tombstone(models.Model):
+    """
+    Records deleted rows so delta-sync clients can drop them too.
+
+    entity is the name of the sync stream the row belonged to, so ids in
+    the response's deleted[name] belong to the rows sent under [name].
+    """
+    ENTITY_INVENTORY = 'inventory'
+    ENTITY_CUSTOMERS = 'customers'
+    ENTITY_CHOICES = [
+        (ENTITY_INVENTORY, 'Inventory'),
+        (ENTITY_CUSTOMERS, 'Customers'),
+    ]
+
+    entity = models.CharField(max_length=20, choices=ENTITY_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.entity} {self.object_id} deleted {self.deleted_at}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at', 'id']),
+        ]
@@ -0,0 +1,127 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import NotificationSetting, OutboxMessage
+
+MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 3600
+
+
+def queue_low_stock_alerts(items, setting=None):
+    """
+    Write low stock alerts for the given inventory rows to the outbox.
+
+    Meant to be called inside the transaction that changed the stock, so
+    the alert is only recorded if that transaction commits. Delivery is
+    left to the dispatch_notifications command.
+    """
+    if not items:
+        return []
+    if setting is None:
+        setting = NotificationSetting.objects.first()
+    if not setting:
+        return []
+    messages = []
+    for item in items:
+        if setting.email:
+            messages.append(OutboxMessage(
+                channel=OutboxMessage.CHANNEL_EMAIL,
+                recipient=setting.email,
+                subject='Low Stock Alert',
+                body=f'Item "{item.name}" is low on stock (quantity: {item.quantity}).',
+            ))
+        if setting.phone_number:
+            messages.append(OutboxMessage(
+                channel=OutboxMessage.CHANNEL_SMS,
+                recipient=setting.phone_number,
+                body=f"Item '{item.name}' is low on stock (quantity: {item.quantity})",
+            ))
+    return OutboxMessage.objects.bulk_create(messages)
+
+
+class TwilioSender:
+    """Sends SMS through one Twilio client, created on first use."""
+
+    def __init__(self):
+        self._client = None
+
+    def __call__(self, to, body):
+        if self._client is None:
+            from twilio.rest import Client
+            self._client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
+        self._client.messages.create(body=body, from_=settings.TWILIO_PHONE_NUMBER, to=to)
+
+
+def backoff_delay(attempts):
+    return timedelta(seconds=min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS))
+
+
+def dispatch_pending(batch_size=100, max_attempts=MAX_ATTEMPTS, sms_sender=None, connection=None):
+    """
+    Deliver one batch of due outbox messages.
+
+    Rows are claimed with SKIP LOCKED so several workers can run side by
+    side. One SMTP connection and one SMS client are shared by the whole
+    batch. Failed messages are retried with exponential backoff until
+    max_attempts is reached, then marked failed.
+
+    Returns a dict with sent/retried/failed counts.
+    """
+    counts = {'sent': 0, 'retried': 0, 'failed': 0}
+    if sms_sender is None:
+        sms_sender = TwilioSender()
+    with transaction.atomic():
+        batch = list(
+            OutboxMessage.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboxMessage.STATUS_PENDING, next_attempt_at__lte=timezone.now())
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        if not batch:
+            return counts
+
+        if connection is None:
+            connection = get_connection(fail_silently=False)
+        opened = False
+        try:
+            for message in batch:
+                message.attempts += 1
+                try:
+                    if message.channel == OutboxMessage.CHANNEL_EMAIL:
+                        if not opened:
+                            connection.open()
+                            opened = True
+                        EmailMessage(
+                            subject=message.subject,
+                            body=message.body,
+                            from_email='noreply@example.com',
+                            to=[message.recipient],
+                            connection=connection,
+                        ).send(fail_silently=False)
+                    else:
+                        sms_sender(message.recipient, message.body)
+                except Exception as exc:
+                    message.last_error = str(exc)
+                    if message.attempts >= max_attempts:
+                        message.status = OutboxMessage.STATUS_FAILED
+                        counts['failed'] += 1
+                    else:
+                        message.next_attempt_at = timezone.now() + backoff_delay(message.attempts)
+                        counts['retried'] += 1
+                else:
+                    message.status = OutboxMessage.STATUS_SENT
+                    message.sent_at = timezone.now()
+                    message.last_error = ''
+                    counts['sent'] += 1
+        finally:
+            if opened:
+                connection.close()
+
+        OutboxMessage.objects.bulk_update(
+            batch, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+        )
+    return counts
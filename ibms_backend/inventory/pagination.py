@@ -0,0 +1,117 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _json_default(value):
+    # Full precision isoformat; DjangoJSONEncoder drops microseconds,
+    # which would make cursors skip or repeat rows.
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def _encode_cursor(direction, values):
+    raw = json.dumps({'d': direction, 'v': values}, default=_json_default, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor, fields):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        direction, values = data['d'], data['v']
+        if direction not in ('n', 'p') or len(values) != len(fields):
+            raise ValueError
+        return direction, [field.to_python(value) for field, value in zip(fields, values)]
+    except (ValueError, TypeError, KeyError, ValidationError):
+        raise InvalidCursor('Invalid cursor.')
+
+
+def _seek(ordering, values, forward):
+    # Builds (a > x) | (a = x & b > y) | ... for the given ordering, with
+    # each comparison flipped for descending fields and for backward seeks.
+    condition = Q()
+    equal = Q()
+    for term, value in zip(ordering, values):
+        name = term.lstrip('-')
+        ascending = not term.startswith('-')
+        lookup = 'gt' if ascending == forward else 'lt'
+        condition |= equal & Q(**{f'{name}__{lookup}': value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+def _reverse(ordering):
+    return [term[1:] if term.startswith('-') else f'-{term}' for term in ordering]
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor, prev_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def response_data(self, results):
+        return {
+            'results': results,
+            'next': self.next_cursor,
+            'prev': self.prev_cursor,
+        }
+
+
+def keyset_paginate(request, queryset, ordering, always=False):
+    """
+    Opt-in cursor pagination over a fixed ordering.
+
+    Returns None when the request has neither a `limit` nor a `cursor`
+    parameter (unless always=True), so callers can keep returning the
+    full list. The ordering
+    must end in a unique field (the id) so every row has a distinct key.
+    Each page is a single indexed range scan, so deep pages cost the same
+    as the first one.
+    """
+    cursor = request.GET.get('cursor')
+    limit = request.GET.get('limit')
+    if cursor is None and limit is None and not always:
+        return None
+    try:
+        limit = int(limit) if limit is not None else DEFAULT_LIMIT
+    except ValueError:
+        raise InvalidCursor('limit must be an integer.')
+    limit = max(1, min(limit, MAX_LIMIT))
+
+    model = queryset.model
+    fields = [model._meta.get_field(term.lstrip('-')) for term in ordering]
+    names = [field.attname for field in fields]
+
+    forward = True
+    if cursor:
+        direction, values = _decode_cursor(cursor, fields)
+        forward = direction == 'n'
+        queryset = queryset.filter(_seek(ordering, values, forward))
+    rows = list(queryset.order_by(*(ordering if forward else _reverse(ordering)))[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not forward:
+        rows.reverse()
+
+    def key(obj):
+        return [getattr(obj, name) for name in names]
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if has_more or not forward:
+            next_cursor = _encode_cursor('n', key(rows[-1]))
+        if cursor and (forward or has_more):
+            prev_cursor = _encode_cursor('p', key(rows[0]))
+    return KeysetPage(rows, next_cursor, prev_cursor)
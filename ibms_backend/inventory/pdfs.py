@@ -0,0 +1,199 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+
+def draw_bill(p, bill, items):
+    width, height = letter
+    y = height - 50
+
+    # Header Section
+    p.setFont("Helvetica-Bold", 16)
+    p.drawCentredString(width / 2, y, "CAR PARTS AND SERVICES")
+    y -= 20
+    p.setFont("Helvetica", 10)
+    p.drawCentredString(width / 2, y, "123 Main Street, YourCity, State, ZIP")
+    p.drawCentredString(width / 2, y - 15, "Phone: 9876543210 | GSTIN: 22AAAAA0000A1Z5")
+    y -= 40
+
+    # Bill Info
+    p.setFont("Helvetica", 10)
+    p.drawString(50, y, f"Bill No: {bill.id}")
+    p.drawString(300, y, f"Date: {bill.date.strftime('%d-%m-%Y %H:%M')}")
+    y -= 15
+    p.drawString(50, y, f"Customer: {bill.customer.name}")
+    y -= 25
+
+    # Table Header
+    p.setFont("Helvetica-Bold", 10)
+    p.line(45, y, width - 45, y)
+    y -= 12
+    p.drawString(50, y, "S.No")
+    p.drawString(90, y, "Item")
+    p.drawString(250, y, "Qty")
+    p.drawString(300, y, "Rate")
+    p.drawString(370, y, "Total")
+    y -= 10
+    p.line(45, y, width - 45, y)
+    y -= 15
+
+    # Items
+    p.setFont("Helvetica", 10)
+    total = 0
+    for idx, item in enumerate(items, 1):
+        if y < 100:
+            p.showPage()
+            y = height - 50
+        line_total = item.quantity * item.price
+        total += line_total
+        p.drawString(50, y, str(idx))
+        p.drawString(90, y, item.name[:25])
+        p.drawString(250, y, str(item.quantity))
+        p.drawString(300, y, f"{item.price:.2f}")
+        p.drawString(370, y, f"{line_total:.2f}")
+        y -= 15
+
+    # Total Line
+    y -= 5
+    p.line(45, y, width - 45, y)
+    y -= 20
+    p.setFont("Helvetica-Bold", 11)
+    p.drawString(300, y, "Grand Total:")
+    p.drawString(400, y, f"{total:.2f}")
+
+    # Footer
+    y -= 40
+    p.setFont("Helvetica-Oblique", 11)
+    p.drawCentredString(width / 2, y, "Thank you for your purchase!")
+    p.drawCentredString(width / 2, y - 15, "Visit Again")
+
+    p.showPage()
+
+
+def render_bill_pdf(bill, items):
+    buffer = io.BytesIO()
+    # invariant keeps timestamps and ids out of the file, so the same
+    # bill always renders to the same bytes and the ETag stays strong
+    p = canvas.Canvas(buffer, pagesize=letter, invariant=1)
+    draw_bill(p, bill, items)
+    p.save()
+    return buffer.getvalue()
+
+
+def bill_content_hash(bill, items):
+    """
+    Hash of everything printed on the bill. It changes only when the bill
+    or its items change, so it doubles as the cache key and the ETag.
+    """
+    digest = hashlib.sha256()
+    digest.update(repr((bill.id, bill.date.isoformat(), str(bill.total), bill.customer.name)).encode())
+    for item in items:
+        digest.update(repr((item.id, item.name, item.quantity, str(item.price))).encode())
+    return digest.hexdigest()
+
+
+# Estimated bytes per cache directory as [bytes, time of the last scan],
+# so a miss only scans the directory when it may be over its limit. Other
+# workers' writes are not counted, hence a full scan every RESCAN_SECONDS.
+RESCAN_SECONDS = 60
+_usage = {}
+_usage_lock = threading.Lock()
+
+
+class BillPdfCache:
+    """
+    Rendered bill PDFs on local disk, named bill_<id>_<hash>.pdf.
+
+    Reads touch the file's mtime, so evicting the oldest mtimes when the
+    directory grows past max_bytes gives LRU behaviour. Writes go to a
+    temporary file first and are renamed into place, so concurrent
+    workers never serve a half written PDF.
+    """
+
+    def __init__(self, directory=None, max_bytes=None):
+        self.directory = Path(directory or settings.IBMS_PDF_CACHE_DIR)
+        self.max_bytes = max_bytes if max_bytes is not None else settings.IBMS_PDF_CACHE_MAX_BYTES
+
+    def path_for(self, bill_id, content_hash):
+        return self.directory / f'bill_{bill_id}_{content_hash[:32]}.pdf'
+
+    def open(self, bill, items, content_hash=None):
+        """
+        Return the cached PDF for the bill opened for binary reading,
+        rendering it first on a miss. Returning an open file (rather than
+        a path) keeps it readable even if it is evicted right after.
+        """
+        content_hash = content_hash or bill_content_hash(bill, items)
+        path = self.path_for(bill.id, content_hash)
+        try:
+            # Touch first: if that fails there is no open file to leak
+            os.utime(path)
+            return open(path, 'rb')
+        except FileNotFoundError:
+            pass
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        data = render_bill_pdf(bill, items)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+        added = len(data)
+        # Older renders of the same bill are stale now
+        for stale in self.directory.glob(f'bill_{bill.id}_*.pdf'):
+            if stale != path:
+                try:
+                    added -= stale.stat().st_size
+                    stale.unlink()
+                except FileNotFoundError:
+                    pass
+        # Opened before evicting, which may pick this very file
+        f = open(path, 'rb')
+        try:
+            self._account(added)
+        except BaseException:
+            f.close()
+            raise
+        return f
+
+    def _account(self, added):
+        with _usage_lock:
+            usage = _usage.get(self.directory)
+            if usage is not None:
+                usage[0] += added
+            due = (
+                usage is None or usage[0] > self.max_bytes
+                or time.monotonic() - usage[1] > RESCAN_SECONDS
+            )
+        if due:
+            self.evict()
+
+    def evict(self):
+        """Delete the least recently used PDFs until the directory fits in max_bytes."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pdf'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        size = sum(e[1] for e in entries)
+        for _mtime, entry_size, path in sorted(entries):
+            if size <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+        with _usage_lock:
+            _usage[self.directory] = [size, time.monotonic()]
@@ -0,0 +1,90 @@
+class Projection:
+    """
+    The wire shape of one entity, declared once.
+
+    Each field maps an output key to a model field path (anything
+    values_list() accepts), optionally with a converter such as str for
+    Decimal prices. rows() builds the dicts straight from a
+    values_list() query, skipping model instantiation. one() builds the
+    same dict from an instance you already have.
+    """
+
+    def __init__(self, **fields):
+        self.keys = []
+        self.paths = []
+        self.converters = []
+        for index, (key, spec) in enumerate(fields.items()):
+            path, convert = spec if isinstance(spec, tuple) else (spec, None)
+            self.keys.append(key)
+            self.paths.append(path)
+            if convert:
+                self.converters.append((index, convert))
+
+    def queryset(self, queryset):
+        # Named rows keep attribute access working for keyset_paginate
+        return queryset.values_list(*self.paths, named=True)
+
+    def rows(self, rows):
+        keys = self.keys
+        converters = self.converters
+        if not converters:
+            return [dict(zip(keys, row)) for row in rows]
+        data = []
+        for row in rows:
+            row = list(row)
+            for index, convert in converters:
+                row[index] = convert(row[index])
+            data.append(dict(zip(keys, row)))
+        return data
+
+    def fetch(self, queryset):
+        return self.rows(self.queryset(queryset))
+
+    def one(self, obj):
+        row = []
+        for path in self.paths:
+            value = obj
+            for name in path.split('__'):
+                value = getattr(value, name)
+            row.append(value)
+        return self.rows([row])[0]
+
+
+INVENTORY = Projection(
+    id='id',
+    name='name',
+    description='description',
+    quantity='quantity',
+    price=('price', str),
+    created_at='created_at',
+    updated_at='updated_at',
+)
+
+CUSTOMER = Projection(
+    id='id',
+    name='name',
+    email='email',
+    phone='phone',
+    created_at='created_at',
+    updated_at='updated_at',
+)
+
+NEW_CUSTOMER = Projection(
+    id='id',
+    name='name',
+    email='email',
+    phone='phone',
+)
+
+BILL = Projection(
+    id='id',
+    date='date',
+    total=('total', str),
+    customer='customer__name',
+)
+
+CUSTOMER_BILL = Projection(
+    id='id',
+    date='date',
+    total=('total', str),
+)
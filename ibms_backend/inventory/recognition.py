@@ -0,0 +1,272 @@
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from PIL import Image, UnidentifiedImageError
+
+from .gemini import GeminiError, get_async_gemini_client
+
+
+def image_hash(image_bytes, size=8):
+    """
+    64-bit difference hash of an image, or None if it cannot be decoded.
+
+    The image is shrunk to 9x8 greyscale and each bit records whether a
+    pixel is brighter than its right neighbour. Global lighting changes
+    and small crops or re-encodes therefore flip only a few bits.
+    """
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            image.draft('L', (size * 8, size * 8))
+            pixels = list(image.convert('L').resize((size + 1, size), Image.LANCZOS).getdata())
+    except (UnidentifiedImageError, OSError, ValueError):
+        return None
+    value = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            right = pixels[row * (size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def _bands(max_distance, bits=64):
+    """
+    Split the hash bits into max_distance + 1 (shift, mask) ranges. Two
+    hashes differing in at most max_distance bits agree on at least one
+    range entirely, so indexing every range finds all near matches.
+    """
+    count = max(1, min(max_distance + 1, bits))
+    bands = []
+    shift = 0
+    for i in range(count):
+        width = bits // count + (i < bits % count)
+        bands.append((shift, (1 << width) - 1))
+        shift += width
+    return bands
+
+
+class RecognitionCache:
+    """
+    LRU cache of recognition results keyed by image hash.
+
+    A lookup returns the closest stored entry within max_distance bits
+    (Hamming distance), so repeat scans of the same item hit even when
+    the photo differs slightly. Each hash is indexed by max_distance + 1
+    slices of its bits, so a lookup only compares the few entries that
+    share a slice with it instead of every entry. Entries expire after
+    ttl seconds.
+
+    When a path is given the cache survives restarts: each insert is
+    appended to the file as one JSON line, and the file is rewritten
+    with just the live entries once it has grown to twice max_entries
+    lines.
+    """
+
+    def __init__(self, max_entries=1024, ttl=7 * 24 * 3600, max_distance=6, path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self.path = path
+        self.entries = OrderedDict()  # hash -> (stored_at, result)
+        self.bands = _bands(max_distance)
+        self.index = [{} for _ in self.bands]  # per band: slice value -> set of hashes
+        self.lines = 0  # lines in the file at path
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        if path:
+            self._load()
+
+    def get(self, key):
+        """Return (result, distance) for the nearest match, or (None, None)."""
+        now = time.time()
+        with self.lock:
+            candidates = set()
+            for (shift, mask), buckets in zip(self.bands, self.index):
+                candidates.update(buckets.get((key >> shift) & mask, ()))
+            best = None
+            for stored_key in candidates:
+                stored_at, result = self.entries[stored_key]
+                if self.ttl and now - stored_at > self.ttl:
+                    self._remove(stored_key)
+                    continue
+                distance = bin(stored_key ^ key).count('1')
+                if distance <= self.max_distance and (best is None or distance < best[0]):
+                    best = (distance, stored_key, result)
+            if best is None:
+                self.misses += 1
+                return None, None
+            self.entries.move_to_end(best[1])
+            self.hits += 1
+            return best[2], best[0]
+
+    def set(self, key, result):
+        stored_at = time.time()
+        with self.lock:
+            self._add(key, stored_at, result)
+            if self.path:
+                self._append(key, stored_at, result)
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses}
+
+    def _add(self, key, stored_at, result):
+        if key not in self.entries:
+            for (shift, mask), buckets in zip(self.bands, self.index):
+                buckets.setdefault((key >> shift) & mask, set()).add(key)
+        self.entries[key] = (stored_at, result)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self._remove(next(iter(self.entries)))
+
+    def _remove(self, key):
+        del self.entries[key]
+        for (shift, mask), buckets in zip(self.bands, self.index):
+            value = (key >> shift) & mask
+            bucket = buckets[value]
+            bucket.discard(key)
+            if not bucket:
+                del buckets[value]
+
+    def _load(self):
+        now = time.time()
+        try:
+            f = open(self.path)
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                self.lines += 1
+                try:
+                    rows = json.loads(line)
+                except ValueError:
+                    # A write cut short by a crash
+                    continue
+                # Files from before the append-only format hold one array of rows
+                for key, stored_at, result in rows if rows and isinstance(rows[0], list) else [rows]:
+                    if not self.ttl or now - stored_at <= self.ttl:
+                        self._add(int(key, 16), stored_at, result)
+
+    def _append(self, key, stored_at, result):
+        if self.lines >= 2 * self.max_entries:
+            self._save()
+            return
+        with open(self.path, 'a') as f:
+            f.write(json.dumps([f'{key:016x}', stored_at, result]) + '\n')
+        self.lines += 1
+
+    def _save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            for key, (stored_at, result) in self.entries.items():
+                f.write(json.dumps([f'{key:016x}', stored_at, result]) + '\n')
+        os.replace(tmp, self.path)
+        self.lines = len(self.entries)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_recognition_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = RecognitionCache(
+                max_entries=settings.IBMS_RECOGNITION_CACHE_SIZE,
+                ttl=settings.IBMS_RECOGNITION_CACHE_TTL,
+                max_distance=settings.IBMS_RECOGNITION_MAX_DISTANCE,
+                path=settings.IBMS_RECOGNITION_CACHE_FILE,
+            )
+        return _cache
+
+
+def decode_image(image_data):
+    """Decode a base64 image, with or without a data: URL prefix."""
+    # Remove data:image/jpeg;base64, prefix if present
+    if image_data.startswith('data:image'):
+        image_data = image_data.split(',')[1]
+    try:
+        image_bytes = base64.b64decode(''.join(image_data.split()), validate=True)
+    except ValueError:
+        image_bytes = b''
+    if not image_bytes:
+        raise ValueError('Invalid image data.')
+    return image_bytes
+
+
+async def arecognize_image(image_bytes):
+    """
+    Name and describe an image, consulting the recognition cache first.
+
+    Returns (result, cache_status, distance) where cache_status is HIT,
+    MISS or BYPASS (image could not be hashed). Raises GeminiError when
+    the vision API call fails.
+    """
+    cache = get_recognition_cache()
+    image_key = await asyncio.to_thread(image_hash, image_bytes)
+    if image_key is not None:
+        cached, distance = cache.get(image_key)
+        if cached is not None:
+            return cached, 'HIT', distance
+    result = await get_async_gemini_client().recognize(image_bytes)
+    if image_key is None:
+        return result, 'BYPASS', None
+    # set() may append to the persistence file, so keep it off the event loop
+    await asyncio.to_thread(cache.set, image_key, result)
+    return result, 'MISS', None
+
+
+async def arecognize_batch(images, parallelism=None):
+    """
+    Recognise a list of base64 images concurrently.
+
+    Identical payloads are sent once. Up to `parallelism` calls run at the
+    same time (and never more than the Gemini client's own limit), so a
+    batch takes roughly as long as its slowest image. Returns one result
+    or {'error': ...} dict per input image, in input order.
+    """
+    parallelism = parallelism or settings.GEMINI_BATCH_PARALLELISM
+    results = [None] * len(images)
+    positions = {}
+    payloads = {}
+    for index, image_data in enumerate(images):
+        if not image_data or not isinstance(image_data, str):
+            results[index] = {'error': 'No image provided.'}
+            continue
+        try:
+            image_bytes = decode_image(image_data)
+        except ValueError as e:
+            results[index] = {'error': str(e)}
+            continue
+        digest = hashlib.sha256(image_bytes).digest()
+        positions.setdefault(digest, []).append(index)
+        payloads[digest] = image_bytes
+
+    slots = asyncio.Semaphore(parallelism)
+
+    async def recognize_one(image_bytes):
+        async with slots:
+            try:
+                return (await arecognize_image(image_bytes))[0]
+            except GeminiError as e:
+                return e.payload
+            except Exception as e:
+                return {'error': str(e)}
+
+    digests = list(payloads)
+    for digest, result in zip(digests, await asyncio.gather(*(recognize_one(payloads[d]) for d in digests))):
+        for index in positions[digest]:
+            results[index] = dict(result)
+    return results
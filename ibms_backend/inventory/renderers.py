@@ -0,0 +1,58 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib path below is used instead
+    orjson = None
+
+_fallback = JSONEncoder()
+
+_CONTAINERS = (dict, list, tuple)
+
+
+def _floats_match_stdlib(data):
+    """
+    False if data holds a float that orjson would write differently from
+    json.dumps: NaN and infinities (orjson writes null where DRF raises)
+    and exponent notation (orjson writes 1e16 and 1e-5, json 1e+16 and
+    1e-05). Every other float is the same shortest round-trip repr.
+    """
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if type(value) is float:
+            if value != 0 and not 1e-4 <= abs(value) < 1e16:
+                # Also true for NaN and infinities
+                return False
+        elif isinstance(value, _CONTAINERS):
+            stack.extend(value.values() if isinstance(value, dict) else value)
+    return True
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that serializes with orjson when it is installed.
+
+    Output is byte-for-byte what DRF's compact JSONRenderer produces:
+    datetimes in UTC end in "Z", Decimals and other types orjson does not
+    know go through DRF's own encoder, and U+2028/U+2029 are escaped.
+    Indented output (browsable API, ?indent=), anything orjson refuses,
+    and floats orjson formats differently (see _floats_match_stdlib) fall
+    back to the stock renderer, which also keeps DRF's error on NaN.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or data is None or self.ensure_ascii or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+            or not _floats_match_stdlib(data)
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=_fallback.default, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
@@ -0,0 +1,99 @@
+from datetime import date, timedelta
+
+from django.db.models import Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import DailySales, DailyProductSales
+
+GRANULARITIES = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+
+def bucket_start(day, granularity):
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(day, granularity):
+    if granularity == 'week':
+        return day + timedelta(days=7)
+    if granularity == 'month':
+        return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return day + timedelta(days=1)
+
+
+def sales_trend(start, end, granularity='day'):
+    """
+    Sales per day, week or month between two local dates (inclusive).
+
+    Reads the DailySales rollup in one grouped query, so the cost depends
+    on the number of days requested rather than the number of bills, then
+    fills buckets without sales with zero. Returns a list of
+    {'date': 'YYYY-MM-DD', 'sales': float} where date is the first day of
+    the bucket.
+    """
+    trunc = GRANULARITIES[granularity]
+    rows = (
+        DailySales.objects.filter(day__gte=start, day__lte=end)
+        .annotate(bucket=trunc('day'))
+        .values('bucket')
+        .annotate(sales=Sum('total'))
+        .order_by('bucket')
+    )
+    totals = {row['bucket']: row['sales'] or 0 for row in rows}
+
+    data = []
+    day = bucket_start(start, granularity)
+    while day <= end:
+        data.append({'date': day.strftime('%Y-%m-%d'), 'sales': float(totals.get(day, 0))})
+        day = next_bucket(day, granularity)
+    return data
+
+
+def sales_summary():
+    totals = DailySales.objects.aggregate(total=Sum('total'), transactions=Sum('bill_count'))
+    total_sales = totals['total'] or 0
+    transactions = totals['transactions'] or 0
+    return {
+        'total_sales': total_sales,
+        'transactions': transactions,
+        'avg_bill': total_sales / transactions if transactions else 0,
+    }
+
+
+def top_products(limit=10):
+    return [
+        {
+            'name': row['inventory__name'],
+            'units_sold': row['units_sold'],
+            'revenue': row['revenue'],
+        }
+        for row in DailyProductSales.objects.values('inventory__name')
+        .annotate(units_sold=Sum('units'), revenue=Sum('revenue'))
+        .order_by('-units_sold')[:limit]
+    ]
+
+
+def parse_trend_params(params, default_days=14):
+    """
+    Read start, end and granularity from query parameters. Raises
+    ValueError with a readable message on bad input.
+    """
+    granularity = params.get('granularity', 'day')
+    if granularity not in GRANULARITIES:
+        raise ValueError('granularity must be day, week or month.')
+    try:
+        end = date.fromisoformat(params['end']) if params.get('end') else timezone.localdate()
+        start = date.fromisoformat(params['start']) if params.get('start') else end - timedelta(days=default_days - 1)
+    except ValueError:
+        raise ValueError('start and end must be dates in YYYY-MM-DD format.')
+    if start > end:
+        raise ValueError('start must not be after end.')
+    return start, end, granularity
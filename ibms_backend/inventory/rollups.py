@@ -0,0 +1,212 @@
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Case, Count, DecimalField, F, Max, Min, PositiveIntegerField, Sum, When
+from django.db.models.functions import Greatest, Least, TruncDate
+from django.utils import timezone
+
+from .cache import bump_data_generation
+from .models import Bill, BillItem, CustomerStats, DailySales, DailyProductSales
+
+
+def record_bill(bill, lines):
+    """
+    Add a freshly created bill to the daily rollups.
+
+    lines is a list of (inventory_id, quantity, price). Must run in the
+    transaction that created the bill. Missing rollup rows are created
+    empty with ignore_conflicts and then incremented with set-based
+    UPDATEs, so concurrent bills for the same day never lose updates.
+    """
+    day = timezone.localdate(bill.date)
+    units = {}
+    revenue = {}
+    for inventory_id, qty, price in lines:
+        units[inventory_id] = units.get(inventory_id, 0) + qty
+        revenue[inventory_id] = revenue.get(inventory_id, Decimal('0')) + price * qty
+
+    DailySales.objects.bulk_create([DailySales(day=day)], ignore_conflicts=True)
+    DailySales.objects.filter(day=day).update(
+        total=F('total') + bill.total,
+        bill_count=F('bill_count') + 1,
+    )
+
+    DailyProductSales.objects.bulk_create(
+        [DailyProductSales(day=day, inventory_id=inventory_id) for inventory_id in units],
+        ignore_conflicts=True,
+    )
+    DailyProductSales.objects.filter(day=day, inventory_id__in=units).update(
+        units=Case(
+            *[When(inventory_id=inventory_id, then=F('units') + qty) for inventory_id, qty in units.items()],
+            default=F('units'),
+            output_field=PositiveIntegerField(),
+        ),
+        revenue=Case(
+            *[When(inventory_id=inventory_id, then=F('revenue') + amount) for inventory_id, amount in revenue.items()],
+            default=F('revenue'),
+            output_field=DecimalField(max_digits=14, decimal_places=2),
+        ),
+    )
+
+
+def record_customer_bill(bill):
+    """
+    Add a freshly created bill to its customer's lifetime stats, in the
+    same create-empty-then-increment way as record_bill.
+    """
+    CustomerStats.objects.bulk_create([CustomerStats(customer_id=bill.customer_id)], ignore_conflicts=True)
+    CustomerStats.objects.filter(customer_id=bill.customer_id).update(
+        bill_count=F('bill_count') + 1,
+        lifetime_spend=F('lifetime_spend') + bill.total,
+        # Least/Greatest ignore NULL on Postgres but not on SQLite
+        first_purchase_at=Case(
+            When(first_purchase_at__isnull=True, then=bill.date),
+            default=Least(F('first_purchase_at'), bill.date),
+        ),
+        last_purchase_at=Case(
+            When(last_purchase_at__isnull=True, then=bill.date),
+            default=Greatest(F('last_purchase_at'), bill.date),
+        ),
+    )
+
+
+def _filter_days(queryset, field, start=None, end=None):
+    if start:
+        queryset = queryset.filter(**{f'{field}__gte': start})
+    if end:
+        queryset = queryset.filter(**{f'{field}__lte': end})
+    return queryset
+
+
+def compute_rollups(start=None, end=None):
+    """
+    Aggregate the raw Bill and BillItem tables into rollup rows (unsaved)
+    for the given range of local dates.
+    """
+    tz = timezone.get_current_timezone()
+    bills = (
+        Bill.objects.annotate(day=TruncDate('date', tzinfo=tz))
+        .values('day')
+        .annotate(total=Sum('total'), bill_count=Count('id'))
+    )
+    daily = [
+        DailySales(day=row['day'], total=row['total'], bill_count=row['bill_count'])
+        for row in _filter_days(bills, 'day', start, end)
+    ]
+    items = (
+        BillItem.objects.annotate(day=TruncDate('bill__date', tzinfo=tz))
+        .values('day', 'inventory_id')
+        .annotate(units=Sum('quantity'), revenue=Sum(F('quantity') * F('price')))
+    )
+    products = [
+        DailyProductSales(day=row['day'], inventory_id=row['inventory_id'], units=row['units'], revenue=row['revenue'])
+        for row in _filter_days(items, 'day', start, end)
+    ]
+    return daily, products
+
+
+def _block_new_bills():
+    """
+    Make bills created from now on wait until the current transaction
+    commits, after waiting for the ones already in progress.
+
+    record_bill and record_customer_bill run in the transaction that
+    inserts the bill, so a rebuild that computes and replaces its rows
+    after this sees every bill exactly once. Reads are not blocked.
+    SQLite needs nothing: it fails a write transaction whose snapshot
+    is out of date instead of letting it overwrite newer data.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE {Bill._meta.db_table} IN SHARE ROW EXCLUSIVE MODE')
+
+
+def rebuild_rollups(start=None, end=None):
+    """
+    Replace the rollups in the given range with freshly computed rows,
+    safe to run while bills are being created.
+    """
+    with transaction.atomic():
+        _block_new_bills()
+        daily, products = compute_rollups(start, end)
+        _filter_days(DailySales.objects.all(), 'day', start, end).delete()
+        _filter_days(DailyProductSales.objects.all(), 'day', start, end).delete()
+        DailySales.objects.bulk_create(daily, batch_size=1000)
+        DailyProductSales.objects.bulk_create(products, batch_size=1000)
+        bump_data_generation()
+    return len(daily), len(products)
+
+
+def verify_rollups(start=None, end=None):
+    """
+    Compare stored rollups against the raw tables. Returns a list of
+    human readable mismatch descriptions, empty when everything matches.
+    """
+    daily, products = compute_rollups(start, end)
+    expected_daily = {row.day: (Decimal(row.total), row.bill_count) for row in daily}
+    stored_daily = {
+        row['day']: (Decimal(row['total']), row['bill_count'])
+        for row in _filter_days(DailySales.objects.all(), 'day', start, end).values('day', 'total', 'bill_count')
+    }
+    expected_products = {(row.day, row.inventory_id): (row.units, Decimal(row.revenue)) for row in products}
+    stored_products = {
+        (row['day'], row['inventory_id']): (row['units'], Decimal(row['revenue']))
+        for row in _filter_days(DailyProductSales.objects.all(), 'day', start, end)
+        .values('day', 'inventory_id', 'units', 'revenue')
+    }
+
+    problems = []
+    for day in sorted(set(expected_daily) | set(stored_daily)):
+        expected = expected_daily.get(day, (Decimal('0'), 0))
+        stored = stored_daily.get(day, (Decimal('0'), 0))
+        if expected != stored:
+            problems.append(f'{day}: expected total/bills {expected}, stored {stored}')
+    for key in sorted(set(expected_products) | set(stored_products)):
+        expected = expected_products.get(key, (0, Decimal('0')))
+        stored = stored_products.get(key, (0, Decimal('0')))
+        if expected != stored:
+            problems.append(f'{key[0]} item {key[1]}: expected units/revenue {expected}, stored {stored}')
+    return problems
+
+
+def compute_customer_stats():
+    """Aggregate the Bill table into CustomerStats rows (unsaved)."""
+    rows = Bill.objects.values('customer_id').annotate(
+        bill_count=Count('id'), spend=Sum('total'), first=Min('date'), last=Max('date'),
+    )
+    return [
+        CustomerStats(
+            customer_id=row['customer_id'], bill_count=row['bill_count'], lifetime_spend=row['spend'],
+            first_purchase_at=row['first'], last_purchase_at=row['last'],
+        )
+        for row in rows.order_by('customer_id').iterator()
+    ]
+
+
+def rebuild_customer_stats():
+    """Replace all customer stats with freshly computed rows, like rebuild_rollups."""
+    with transaction.atomic():
+        _block_new_bills()
+        stats = compute_customer_stats()
+        CustomerStats.objects.all().delete()
+        CustomerStats.objects.bulk_create(stats, batch_size=1000)
+        bump_data_generation()
+    return len(stats)
+
+
+def verify_customer_stats():
+    """Compare stored customer stats with the Bill table; returns mismatches."""
+    def key(stats):
+        return (stats.bill_count, Decimal(stats.lifetime_spend), stats.first_purchase_at, stats.last_purchase_at)
+
+    expected = {stats.customer_id: key(stats) for stats in compute_customer_stats()}
+    stored = {stats.customer_id: key(stats) for stats in CustomerStats.objects.all().iterator()}
+    empty = (0, Decimal('0'), None, None)
+    problems = []
+    for customer_id in sorted(set(expected) | set(stored)):
+        if expected.get(customer_id, empty) != stored.get(customer_id, empty):
+            problems.append(
+                f'customer {customer_id}: expected {expected.get(customer_id, empty)}, '
+                f'stored {stored.get(customer_id, empty)}'
+            )
+    return problems
@@ -0,0 +1,125 @@
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+REPLICA = 'replica'
+RECENT_WRITE_KEY = 'ibms:recent-write'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_replica_reads = ContextVar('replica_reads', default=None)
+
+
+def replica_configured():
+    return REPLICA in connections.settings
+
+
+def recently_written():
+    return cache.get(RECENT_WRITE_KEY) is not None
+
+
+class _ReplicaReads:
+    # Decided on the first query that could use the replica, so requests
+    # that never reach the database (cache hits) skip the cache lookup
+    allowed = None
+
+    def use_replica(self):
+        if self.allowed is None:
+            self.allowed = not recently_written()
+        return self.allowed
+
+
+class PrimaryAfterWriteMiddleware:
+    """
+    Keep @replica_reads views on the primary for
+    settings.IBMS_REPLICA_STICKY_SECONDS after any write request, so a
+    client that re-fetches right after a change never reads a replica
+    that has not replayed it yet.
+
+    The mark lives in the default cache, so it covers every worker when
+    the cache is shared (IBMS_CACHE_DIR) and only the worker that took
+    the write with the per-process LocMemCache.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in SAFE_METHODS and replica_configured():
+            cache.set(RECENT_WRITE_KEY, True, timeout=settings.IBMS_REPLICA_STICKY_SECONDS)
+        return response
+
+
+class ReplicaRouter:
+    """
+    Sends reads to the `replica` database inside views marked with
+    @replica_reads, and everything else to `default`.
+
+    Writes always go to the primary, and so do reads made while a
+    transaction is open on it, so read-after-write paths stay consistent.
+    Reads also stay on the primary for a short while after any write
+    request (see PrimaryAfterWriteMiddleware).
+    Migrations only run on the primary; the replica is a copy of it.
+    """
+
+    def db_for_read(self, model, **hints):
+        reads = _replica_reads.get()
+        if (
+            reads and replica_configured() and not connections['default'].in_atomic_block
+            and reads.use_replica()
+        ):
+            return REPLICA
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+def _iter_on_replica(iterator, reads):
+    # Set per chunk: under ASGI each chunk may be produced in a different
+    # context, so the flag cannot be held across yields.
+    iterator = iter(iterator)
+    while True:
+        token = _replica_reads.set(reads)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _replica_reads.reset(token)
+        yield chunk
+
+
+def replica_reads(view):
+    """
+    Let a read-only view (lists, search, exports, reports) read from the
+    replica when one is configured. Streaming responses keep reading from
+    it while their content is generated after the view has returned.
+
+    Around @cached_report only cache misses query the replica. Their
+    results are stored under the data generation read before the query,
+    and for IBMS_REPLICA_STICKY_SECONDS after a write the misses read
+    the primary, so a lagging replica cannot fill the new generation
+    with data from before the write.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        reads = _ReplicaReads()
+        token = _replica_reads.set(reads)
+        try:
+            response = view(request, *args, **kwargs)
+        finally:
+            _replica_reads.reset(token)
+        if getattr(response, 'streaming', False):
+            response.streaming_content = _iter_on_replica(response.streaming_content, reads)
+        return response
+    return wrapper
@@ -0,0 +1,100 @@
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connections
+from django.db.models import Case, FloatField, Q, Value, When
+from django.db.models.functions import Greatest, Upper
+
+from .models import Bill, Customer, Inventory
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+# Matches on secondary fields (phone, description) rank below name matches
+SECONDARY_WEIGHT = 0.5
+
+
+def search_queryset(queryset, fields, term):
+    """
+    Filter queryset to rows where any of fields matches term and annotate
+    a relevance `rank` (0..1, higher is better).
+
+    On Postgres a row matches when UPPER(field) contains the term or is
+    trigram word-similar to it; both conditions are served by the
+    UPPER(field) gin_trgm_ops indexes from migration 0013, and rank is
+    pg_trgm word_similarity. Other databases fall back to a substring
+    match ranked exact > prefix > contains.
+    """
+    term = term.strip().upper()
+    postgres = connections[queryset.db].vendor == 'postgresql'
+    match = Q()
+    ranks = []
+    for index, field in enumerate(fields):
+        key = f'_search_{index}'
+        queryset = queryset.alias(**{key: Upper(field)})
+        match |= Q(**{f'{key}__contains': term})
+        if postgres:
+            match |= Q(**{f'{key}__trigram_word_similar': term})
+            rank = TrigramWordSimilarity(term, key)
+        else:
+            rank = Case(
+                When(**{key: term}, then=Value(1.0)),
+                When(**{f'{key}__startswith': term}, then=Value(0.8)),
+                When(**{f'{key}__contains': term}, then=Value(0.6)),
+                default=Value(0.0),
+                output_field=FloatField(),
+            )
+        ranks.append(rank if index == 0 else rank * Value(SECONDARY_WEIGHT))
+    rank = ranks[0] if len(ranks) == 1 else Greatest(*ranks)
+    return queryset.filter(match).annotate(rank=rank)
+
+
+def _search_customers(term, limit):
+    customers = search_queryset(Customer.objects.all(), ['name', 'phone'], term)
+    customers = customers.order_by('-rank', 'name', 'id')[:limit]
+    return list(customers.values('id', 'name', 'email', 'phone', 'rank'))
+
+
+def _search_inventory(term, limit):
+    items = Inventory.objects.all()
+    items = search_queryset(items, ['name', 'description'], term).order_by('-rank', 'name', 'id')[:limit]
+    return [
+        {
+            'id': item['id'],
+            'sku': item['sku'],
+            'name': item['name'],
+            'description': item['description'],
+            'quantity': item['quantity'],
+            'price': str(item['price']),
+            'rank': item['rank'],
+        }
+        for item in items.values('id', 'sku', 'name', 'description', 'quantity', 'price', 'rank')
+    ]
+
+
+def _search_bills(term, limit):
+    if term.isdigit():
+        bills = Bill.objects.filter(id=int(term)).annotate(rank=Value(1.0, output_field=FloatField()))
+    else:
+        bills = search_queryset(Bill.objects.all(), ['customer__name'], term)
+    bills = bills.order_by('-rank', '-date', '-id')[:limit]
+    return [
+        {
+            'id': bill['id'],
+            'date': bill['date'],
+            'total': str(bill['total']),
+            'customer': bill['customer__name'],
+            'rank': bill['rank'],
+        }
+        for bill in bills.values('id', 'date', 'total', 'customer__name', 'rank')
+    ]
+
+
+SEARCHES = {
+    'bills': _search_bills,
+    'customers': _search_customers,
+    'inventory': _search_inventory,
+}
+
+
+def run_search(entity, term, limit=DEFAULT_LIMIT):
+    """Return up to limit ranked results for one of SEARCHES."""
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    return SEARCHES[entity](term.strip(), limit)
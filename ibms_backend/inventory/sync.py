@@ -0,0 +1,115 @@
+import base64
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Bill, Customer, Inventory, Tombstone
+from .pagination import _json_default, _seek
+from .projections import BILL, CUSTOMER, INVENTORY
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 5000
+
+# name -> (queryset, change timestamp field, projection)
+STREAMS = {
+    'inventory': (lambda: Inventory.objects.all(), 'updated_at', INVENTORY),
+    'customers': (lambda: Customer.objects.all(), 'updated_at', CUSTOMER),
+    'bills': (lambda: Bill.objects.all(), 'date', BILL),
+}
+
+
+class InvalidWatermark(ValueError):
+    pass
+
+
+def encode_watermark(positions):
+    raw = json.dumps(positions, default=_json_default, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_watermark(token):
+    """Return {stream: (timestamp, id)} from a watermark token."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        positions = {}
+        for name, (stamp, id) in data.items():
+            if name not in STREAMS and name != 'deleted':
+                raise ValueError
+            stamp = parse_datetime(stamp)
+            if stamp is None or not isinstance(id, int):
+                raise ValueError
+            positions[name] = (stamp, id)
+        return positions
+    except (ValueError, TypeError, AttributeError):
+        raise InvalidWatermark('Invalid watermark.')
+
+
+def _changes(queryset, field, position, horizon, limit):
+    # Keyset over (field, id) so rows sharing a timestamp are never
+    # skipped or repeated across calls.
+    ordering = [field, 'id']
+    queryset = queryset.filter(**{f'{field}__lte': horizon})
+    if position:
+        queryset = queryset.filter(_seek(ordering, position, True))
+    rows = list(queryset.order_by(*ordering)[:limit + 1])
+    return rows[:limit], len(rows) > limit
+
+
+def changes_since(token=None, limit=DEFAULT_LIMIT):
+    """
+    Everything created, updated or deleted after the watermark.
+
+    Each stream (inventory, customers, bills, deletions) advances its own
+    (timestamp, id) position. Rows newer than now minus
+    settings.IBMS_SYNC_SETTLE_SECONDS are held back until a later call,
+    because a transaction that is still open can commit rows stamped
+    slightly earlier than ones already visible. Clients repeat the call
+    with the returned watermark while has_more is true.
+    """
+    positions = decode_watermark(token) if token else {}
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    horizon = timezone.now() - timedelta(seconds=settings.IBMS_SYNC_SETTLE_SECONDS)
+    data = {}
+    has_more = False
+    for name, (queryset, field, projection) in STREAMS.items():
+        # The projected columns, then the (timestamp, id) position
+        width = len(projection.paths)
+        rows, more = _changes(
+            queryset().values_list(*projection.paths, field, 'id'), field, positions.get(name), horizon, limit,
+        )
+        has_more = has_more or more
+        if rows:
+            positions[name] = rows[-1][width:]
+        data[name] = projection.rows(row[:width] for row in rows)
+
+    tombstones, more = _changes(
+        Tombstone.objects.values_list('entity', 'object_id', 'deleted_at', 'id'),
+        'deleted_at', positions.get('deleted'), horizon, limit,
+    )
+    has_more = has_more or more
+    if tombstones:
+        positions['deleted'] = tombstones[-1][2:]
+    deleted = {entity: [] for entity, _label in Tombstone.ENTITY_CHOICES}
+    for entity, object_id, _deleted_at, _id in tombstones:
+        deleted[entity].append(object_id)
+    data['deleted'] = deleted
+
+    data['watermark'] = encode_watermark(positions)
+    data['has_more'] = has_more
+    return data
+
+
+@receiver(post_delete, sender=Inventory)
+def inventory_tombstone(sender, instance, **kwargs):
+    Tombstone.objects.create(entity=Tombstone.ENTITY_INVENTORY, object_id=instance.pk)
+
+
+@receiver(post_delete, sender=Customer)
+def customer_tombstone(sender, instance, **kwargs):
+    Tombstone.objects.create(entity=Tombstone.ENTITY_CUSTOMERS, object_id=instance.pk)
@@ -1,3 +1,1353 @@
-from django.test import TestCase
+import asyncio
+import base64
+import functools
+import io
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock, skipIf, skipUnless
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
-# Create your tests here.
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, connection, connections, transaction
+from django.db.models import F
+from django.http import HttpResponse
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from . import billing, bulk_pdfs, exports, imports, pdfs, recognition, rollups
+from .cache import GENERATION_KEY, _incr_generation, bump_data_generation, data_generation
+from .gemini import AsyncGeminiClient, GeminiError, get_async_gemini_client, parse_response
+from .manager_report import MAX_ATTEMPTS, claim_next_job, enqueue_report, run_job
+from .models import Bill, Customer, CustomerStats, DailyProductSales, DailySales, Inventory, NotificationSetting, OutboxMessage, ReportJob, Tombstone
+from .notifications import backoff_delay, dispatch_pending
+from .recognition import RecognitionCache
+from .renderers import FastJSONRenderer
+from .search import run_search
+from .reports import sales_trend
+from .routers import RECENT_WRITE_KEY, REPLICA, replica_reads
+from .sync import STREAMS, InvalidWatermark, changes_since, decode_watermark, encode_watermark
+from .typeahead import GENERATION_KEY as TYPEAHEAD_GENERATION_KEY, PrefixIndex, invalidate_typeahead, typeahead
+
+
+class CreateBillTests(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(name='Ada', email='ada@example.com', phone='100')
+        self.items = [
+            Inventory.objects.create(name=f'Item {i}', quantity=50, price=Decimal('2.50'))
+            for i in range(10)
+        ]
+
+    def lines(self, items, quantity=1):
+        return [{'inventory_id': item.id, 'quantity': quantity, 'price': str(item.price)} for item in items]
+
+    def test_query_count_does_not_grow_with_lines(self):
+        # The first bill creates the day's rollup rows; measure from the second on
+        billing.create_bill(self.customer.id, self.lines(self.items))
+        with CaptureQueriesContext(connection) as one_line:
+            billing.create_bill(self.customer.id, self.lines(self.items[:1]))
+        with self.assertNumQueries(len(one_line)):
+            billing.create_bill(self.customer.id, self.lines(self.items))
+
+    def test_oversell_is_rejected(self):
+        item = self.items[0]
+        with self.assertRaisesMessage(billing.BillingError, 'Not enough stock'):
+            billing.create_bill(self.customer.id, self.lines([item, self.items[1]], quantity=51))
+        item.refresh_from_db()
+        self.assertEqual(item.quantity, 50)
+        self.assertFalse(Bill.objects.exists())
+
+    def test_repeated_lines_count_against_the_same_stock(self):
+        item = self.items[0]
+        with self.assertRaises(billing.BillingError):
+            billing.create_bill(self.customer.id, self.lines([item], quantity=30) * 2)
+        bill = billing.create_bill(self.customer.id, self.lines([item], quantity=25) * 2)
+        item.refresh_from_db()
+        self.assertEqual(item.quantity, 0)
+        self.assertEqual(bill.total, Decimal('125.00'))
+
+    def test_load_bill_takes_two_queries(self):
+        bill = billing.create_bill(self.customer.id, self.lines(self.items))
+        with self.assertNumQueries(2):
+            loaded, items = billing.load_bill(bill.id)
+            self.assertEqual(loaded.customer.name, 'Ada')
+            self.assertEqual([item.name for item in items], [item.name for item in self.items])
+
+    def test_items_keep_the_name_from_billing_time(self):
+        item = self.items[0]
+        bill = billing.create_bill(self.customer.id, self.lines([item]))
+        Inventory.objects.filter(id=item.id).update(name='Renamed')
+        _, items = billing.load_bill(bill.id)
+        self.assertEqual(items[0].name, 'Item 0')
+        response = self.client.get(f'/api/inventory/bill/{bill.id}/details/')
+        self.assertEqual(response.json()['items'][0]['name'], 'Item 0')
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        NotificationSetting.objects.create(email='manager@example.com', phone_number='+15550000')
+        self.customer = Customer.objects.create(name='Ada', email='ada@example.com', phone='100')
+        self.item = Inventory.objects.create(name='Lamp', quantity=3, price=Decimal('10.00'))
+        self.sms = []
+
+    def sell_to_low_stock(self):
+        billing.create_bill(self.customer.id, [{'inventory_id': self.item.id, 'quantity': 2, 'price': '10.00'}])
+
+    def send_sms(self, to, body):
+        self.sms.append((to, body))
+
+    def test_alerts_are_queued_with_the_bill(self):
+        self.sell_to_low_stock()
+        self.assertEqual(
+            sorted(OutboxMessage.objects.values_list('channel', flat=True)),
+            [OutboxMessage.CHANNEL_EMAIL, OutboxMessage.CHANNEL_SMS],
+        )
+        self.assertEqual(mail.outbox, [])
+
+    def test_alerts_roll_back_with_the_bill(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.sell_to_low_stock()
+            raise RuntimeError
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_dispatch_sends_email_and_sms(self):
+        self.sell_to_low_stock()
+        counts = dispatch_pending(sms_sender=self.send_sms)
+        self.assertEqual(counts, {'sent': 2, 'retried': 0, 'failed': 0})
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['manager@example.com'])
+        self.assertEqual([to for to, _body in self.sms], ['+15550000'])
+        self.assertFalse(OutboxMessage.objects.exclude(status=OutboxMessage.STATUS_SENT).exists())
+        # Nothing is sent twice
+        self.assertEqual(dispatch_pending(sms_sender=self.send_sms)['sent'], 0)
+
+    def test_failed_send_is_retried_with_backoff(self):
+        self.sell_to_low_stock()
+
+        def failing_sms(to, body):
+            raise ConnectionError('gateway down')
+
+        before = timezone.now()
+        counts = dispatch_pending(sms_sender=failing_sms)
+        self.assertEqual(counts, {'sent': 1, 'retried': 1, 'failed': 0})
+        sms = OutboxMessage.objects.get(channel=OutboxMessage.CHANNEL_SMS)
+        self.assertEqual((sms.status, sms.attempts, sms.last_error), (OutboxMessage.STATUS_PENDING, 1, 'gateway down'))
+        self.assertGreaterEqual(sms.next_attempt_at, before + backoff_delay(1))
+
+        # Not due yet, then delivered once the backoff has passed
+        self.assertEqual(dispatch_pending(sms_sender=self.send_sms)['sent'], 0)
+        OutboxMessage.objects.filter(id=sms.id).update(next_attempt_at=timezone.now())
+        self.assertEqual(dispatch_pending(sms_sender=self.send_sms), {'sent': 1, 'retried': 0, 'failed': 0})
+        sms.refresh_from_db()
+        self.assertEqual((sms.status, sms.attempts, sms.last_error), (OutboxMessage.STATUS_SENT, 2, ''))
+
+    def test_message_fails_after_max_attempts(self):
+        self.sell_to_low_stock()
+
+        def failing_sms(to, body):
+            raise ConnectionError('gateway down')
+
+        for _ in range(2):
+            OutboxMessage.objects.update(next_attempt_at=timezone.now())
+            counts = dispatch_pending(max_attempts=2, sms_sender=failing_sms)
+        self.assertEqual(counts['failed'], 1)
+        self.assertEqual(OutboxMessage.objects.get(channel=OutboxMessage.CHANNEL_SMS).status, OutboxMessage.STATUS_FAILED)
+
+
+class BillPdfExportTests(TestCase):
+    def setUp(self):
+        customer = Customer.objects.create(name='Ada', email='ada@example.com', phone='100')
+        item = Inventory.objects.create(name='Lamp', quantity=10, price=Decimal('10.00'))
+        for _ in range(3):
+            billing.create_bill(customer.id, [{'inventory_id': item.id, 'quantity': 1, 'price': '10.00'}])
+
+    def export(self, fmt):
+        response = self.client.get('/api/inventory/export/bill-pdfs/', {'format': fmt})
+        return response, b''.join(response.streaming_content) if response.streaming else response.content
+
+    def test_zip_has_one_pdf_per_bill(self):
+        response, body = self.export('zip')
+        self.assertEqual(response.status_code, 200)
+        with zipfile.ZipFile(io.BytesIO(body)) as archive:
+            self.assertEqual(len(archive.namelist()), 3)
+
+    def test_combined_pdf_is_capped(self):
+        with self.settings(IBMS_COMBINED_PDF_MAX_BILLS=3):
+            response, body = self.export('pdf')
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(body.startswith(b'%PDF'))
+        with self.settings(IBMS_COMBINED_PDF_MAX_BILLS=2):
+            response, body = self.export('pdf')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('format=zip', json.loads(body)['error'])
+
+    def test_workers_work_under_spawn(self):
+        spawn = functools.partial(bulk_pdfs.ProcessPoolExecutor, mp_context=multiprocessing.get_context('spawn'))
+        with mock.patch.object(bulk_pdfs, 'ProcessPoolExecutor', spawn):
+            body = b''.join(bulk_pdfs.iter_zip({}, workers=1))
+        with zipfile.ZipFile(io.BytesIO(body)) as archive:
+            self.assertEqual(len(archive.namelist()), 3)
+
+
+class ManagerReportTests(TestCase):
+    def setUp(self):
+        NotificationSetting.objects.create(email='manager@example.com')
+        customer = Customer.objects.create(name='Ada', email='ada@example.com', phone='100')
+        item = Inventory.objects.create(name='Lamp', quantity=10, price=Decimal('10.00'))
+        billing.create_bill(customer.id, [{'inventory_id': item.id, 'quantity': 2, 'price': '10.00'}])
+
+    def test_run_job_emails_the_report(self):
+        job = enqueue_report()
+        claimed = claim_next_job()
+        self.assertEqual((claimed.id, claimed.status, claimed.attempts), (job.id, ReportJob.STATUS_RUNNING, 1))
+        run_job(claimed)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.recipient, job.error), (ReportJob.STATUS_DONE, 'manager@example.com', ''))
+        self.assertEqual(len(mail.outbox), 1)
+        name, content, mimetype = mail.outbox[0].attachments[0]
+        self.assertEqual((name, mimetype), ('report_summary.pdf', 'application/pdf'))
+        self.assertTrue(content.startswith(b'%PDF'))
+        self.assertIsNone(claim_next_job())
+
+    def test_run_job_records_failure(self):
+        NotificationSetting.objects.update(email='')
+        enqueue_report()
+        job = run_job(claim_next_job())
+        self.assertEqual((job.status, job.error), (ReportJob.STATUS_FAILED, 'Manager email not set.'))
+        self.assertEqual(mail.outbox, [])
+
+    def test_stale_running_jobs_are_reclaimed_then_failed(self):
+        job = enqueue_report()
+        claim_next_job()
+        # The worker died: the job stays running until it is older than the timeout
+        self.assertIsNone(claim_next_job(stale_after=60))
+        ReportJob.objects.filter(id=job.id).update(started_at=timezone.now() - timedelta(seconds=120))
+        self.assertEqual(claim_next_job(stale_after=60).attempts, 2)
+
+        ReportJob.objects.filter(id=job.id).update(
+            attempts=MAX_ATTEMPTS, started_at=timezone.now() - timedelta(seconds=120),
+        )
+        self.assertIsNone(claim_next_job(stale_after=60))
+        job.refresh_from_db()
+        self.assertEqual(job.status, ReportJob.STATUS_FAILED)
+
+
+class StubGemini:
+    """
+    Local stand-in for the Gemini API. Answers with the queued statuses
+    (then 200s) after `delay` seconds and records the peak number of
+    requests in flight.
+    """
+
+    def __init__(self, statuses=(), delay=0):
+        self.statuses = list(statuses)
+        self.delay = delay
+        self.requests = 0
+        self.in_flight = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                with stub.lock:
+                    stub.requests += 1
+                    stub.in_flight += 1
+                    stub.peak = max(stub.peak, stub.in_flight)
+                    status = stub.statuses.pop(0) if stub.statuses else 200
+                try:
+                    time.sleep(stub.delay)
+                    body = json.dumps({'candidates': [{'content': {'parts': [
+                        {'text': '{"name": "Lamp", "description": "A desk lamp"}'},
+                    ]}}]}).encode() if status == 200 else b'{"error": "busy"}'
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    with stub.lock:
+                        stub.in_flight -= 1
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class GeminiClientTests(SimpleTestCase):
+    def stub(self, **kwargs):
+        stub = StubGemini(**kwargs)
+        self.addCleanup(stub.close)
+        return stub
+
+    def client_for(self, stub, **kwargs):
+        client = AsyncGeminiClient(api_key='test', url=stub.url, **kwargs)
+        self.addCleanup(client.close)
+        return client
+
+    def test_transient_errors_are_retried(self):
+        stub = self.stub(statuses=[503, 429])
+        result = asyncio.run(self.client_for(stub, max_retries=2).generate({}))
+        self.assertEqual(parse_response(result), {'name': 'Lamp', 'description': 'A desk lamp'})
+        self.assertEqual(stub.requests, 3)
+
+    def test_retries_are_bounded(self):
+        stub = self.stub(statuses=[503, 503, 503])
+        with self.assertRaises(GeminiError) as caught:
+            asyncio.run(self.client_for(stub, max_retries=1).generate({}))
+        self.assertEqual(caught.exception.payload['error'], 'Gemini API error')
+        self.assertEqual(stub.requests, 2)
+
+    def test_client_errors_are_not_retried(self):
+        stub = self.stub(statuses=[400])
+        with self.assertRaises(GeminiError):
+            asyncio.run(self.client_for(stub, max_retries=2).generate({}))
+        self.assertEqual(stub.requests, 1)
+
+    def test_read_timeout(self):
+        stub = self.stub(delay=1)
+        start = time.monotonic()
+        with self.assertRaises(GeminiError) as caught:
+            asyncio.run(self.client_for(stub, read_timeout=0.1, max_retries=1).generate({}))
+        self.assertEqual(caught.exception.status, 504)
+        self.assertEqual(stub.requests, 2)
+        self.assertLess(time.monotonic() - start, 1.5)
+
+    def test_concurrency_is_capped(self):
+        stub = self.stub(delay=0.1)
+        client = self.client_for(stub, max_concurrency=2)
+
+        async def burst():
+            return await asyncio.gather(*(client.generate({}) for _ in range(6)))
+
+        self.assertEqual(len(asyncio.run(burst())), 6)
+        self.assertEqual(stub.requests, 6)
+        self.assertEqual(stub.peak, 2)
+
+    def test_cap_and_session_are_shared_across_event_loops(self):
+        # Under WSGI each request runs the async view in its own loop
+        stub = self.stub(delay=0.1)
+        client = self.client_for(stub, max_concurrency=2)
+        sessions = []
+
+        def request():
+            asyncio.run(client.generate({}))
+            sessions.append(client.session)
+
+        threads = [threading.Thread(target=request) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(stub.requests, 6)
+        self.assertEqual(stub.peak, 2)
+        self.assertEqual(len(set(map(id, sessions))), 1)
+
+    def test_one_client_per_process(self):
+        clients = [asyncio.run(self.current_client()) for _ in range(2)]
+        self.assertIs(clients[0], clients[1])
+
+    async def current_client(self):
+        return get_async_gemini_client()
+
+
+class TypeaheadTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        typeahead.indexes = None
+        self.addCleanup(setattr, typeahead, 'indexes', None)
+        patcher = mock.patch('inventory.typeahead.threading')
+        self.threading = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def names(self, term):
+        return [entry['name'] for entry in typeahead.suggest('inventory', term)]
+
+    def finish_rebuild(self):
+        # Does the work of the thread suggest() started, on the test's connection
+        self.threading.Thread.assert_called_once_with(target=typeahead._background_rebuild, daemon=True)
+        self.threading.Thread.reset_mock()
+        try:
+            typeahead._rebuild()
+        finally:
+            typeahead.build_lock.release()
+
+    def test_first_lookup_builds_inline(self):
+        Inventory.objects.create(name='Lamp', quantity=1, price=Decimal('3'))
+        self.assertEqual(self.names('lamp'), ['Lamp'])
+        self.threading.Thread.assert_not_called()
+
+    def test_saves_are_applied_on_commit(self):
+        self.assertEqual(self.names('lamp'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            item = Inventory.objects.create(name='Lamp Shade', quantity=1, price=Decimal('3'))
+        self.assertEqual(self.names('lamp'), ['Lamp Shade'])
+        with self.captureOnCommitCallbacks(execute=True):
+            item.delete()
+        self.assertEqual(self.names('lamp'), [])
+        self.threading.Thread.assert_not_called()
+
+    def test_invalidation_rebuilds_after_bulk_writes(self):
+        self.assertEqual(self.names('lamp'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            Inventory.objects.bulk_create([Inventory(name='Lamp', quantity=1, price=Decimal('3'))])
+            invalidate_typeahead()
+        # Answered from the old index while the new one loads
+        self.assertEqual(self.names('lamp'), [])
+        self.finish_rebuild()
+        self.assertEqual(self.names('lamp'), ['Lamp'])
+        self.threading.Thread.assert_not_called()
+
+    def test_one_rebuild_at_a_time(self):
+        self.names('lamp')
+        typeahead.built_at -= 3600
+        self.names('lamp')
+        self.names('lamp')
+        self.finish_rebuild()
+
+    def test_old_index_is_reloaded(self):
+        # Stands in for a write made through another worker with a per-process cache
+        self.assertEqual(self.names('lamp'), [])
+        Inventory.objects.bulk_create([Inventory(name='Lamp', quantity=1, price=Decimal('3'))])
+        with self.settings(IBMS_TYPEAHEAD_MAX_AGE=60, IBMS_TYPEAHEAD_CHECK_SECONDS=3600):
+            self.assertEqual(self.names('lamp'), [])
+            self.threading.Thread.assert_not_called()
+            typeahead.built_at -= 61
+            self.assertEqual(self.names('lamp'), [])
+            self.finish_rebuild()
+            self.assertEqual(self.names('lamp'), ['Lamp'])
+
+    def test_shared_counter_is_read_at_most_every_interval(self):
+        self.names('lamp')
+        Inventory.objects.bulk_create([Inventory(name='Lamp', quantity=1, price=Decimal('3'))])
+        # Another process invalidated through the shared cache
+        _incr_generation(TYPEAHEAD_GENERATION_KEY)
+        with self.settings(IBMS_TYPEAHEAD_CHECK_SECONDS=30), \
+                mock.patch.object(typeahead, '_shared_generation', wraps=typeahead._shared_generation) as read:
+            for _ in range(5):
+                self.assertEqual(self.names('lamp'), [])
+            read.assert_not_called()
+            typeahead.checked_at -= 30
+            self.names('lamp')
+            self.names('lamp')
+            self.assertEqual(read.call_count, 1)
+        self.finish_rebuild()
+        self.assertEqual(self.names('lamp'), ['Lamp'])
+
+    def test_changes_during_a_rebuild_are_kept(self):
+        self.names('lamp')
+        load = PrefixIndex.load
+
+        def load_then_save(index, entries):
+            load(index, entries)
+            if not typeahead.pending:
+                # Committed after the rebuild's query read the table
+                typeahead.apply('inventory', 999, {'id': 999, 'name': 'Lamp Oil', 'sku': None, 'price': 2})
+        with mock.patch.object(PrefixIndex, 'load', load_then_save):
+            typeahead.rebuild()
+        self.assertEqual(self.names('lamp'), ['Lamp Oil'])
+        self.assertEqual(typeahead.generation, typeahead._shared_generation())
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    def test_matches_stock_renderer(self):
+        data = {
+            'total': Decimal('12.50'), 'when': timezone.now(), 'name': 'Caf\u00e9 \u2028',
+            'floats': [0.0, 0.1, 2.5, 1e15, 1e16, 1e-5, -3e20], 'rows': [(1, None, True)],
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_non_finite_floats_still_raise(self):
+        for value in (float('nan'), float('inf')):
+            with self.assertRaises(ValueError):
+                FastJSONRenderer().render({'value': [value]})
+
+
+class ConditionalTests(TestCase):
+    def setUp(self):
+        self.item = Inventory.objects.create(name='Lamp', quantity=5, price=Decimal('3.00'))
+        self.url = f'/api/inventory/{self.item.id}/'
+
+    def test_unchanged_item_is_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_missing_item_has_no_validators(self):
+        response = self.client.get('/api/inventory/999999/')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertFalse(response.has_header('Last-Modified'))
+
+    def test_customer_history_validators(self):
+        customer = Customer.objects.create(name='Ana', phone='1', email='ana@example.com')
+        self.assertTrue(self.client.get(f'/api/inventory/customer/{customer.id}/history/').has_header('ETag'))
+        self.assertFalse(self.client.get('/api/inventory/customer/999999/history/').has_header('ETag'))
+
+    def test_etag_covers_query_string_and_accept(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertNotEqual(self.client.get(self.url, {'fields': 'id'})['ETag'], etag)
+        self.assertNotEqual(self.client.get(self.url, HTTP_ACCEPT='text/html')['ETag'], etag)
+
+    def test_writes_ignore_preconditions(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.put(
+            self.url, {'quantity': 50}, content_type='application/json', HTTP_IF_NONE_MATCH=etag,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+
+
+class CustomerHistoryTests(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(name='Ada', email='ada@example.com', phone='100')
+        self.item = Inventory.objects.create(name='Lamp', quantity=100, price=Decimal('2.50'))
+        self.bills = [self.bill(self.customer, quantity) for quantity in range(1, 6)]
+        other = Customer.objects.create(name='Ana', email='ana@example.com', phone='200')
+        self.bill(other, 1)
+        self.url = f'/api/inventory/customer/{self.customer.id}/history/'
+
+    def bill(self, customer, quantity):
+        lines = [{'inventory_id': self.item.id, 'quantity': quantity, 'price': '2.50'}]
+        return billing.create_bill(customer.id, lines)
+
+    def page(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_pages_walk_the_customers_bills_newest_first(self):
+        # Equal dates across page boundaries, so only the id breaks ties
+        Bill.objects.update(date=self.bills[0].date)
+        seen, sizes = [], []
+        data = self.page(limit=2)
+        self.assertIsNone(data['prev'])
+        while True:
+            seen += [row['id'] for row in data['results']]
+            sizes.append(len(data['results']))
+            if not data['next']:
+                break
+            data = self.page(limit=2, cursor=data['next'])
+        self.assertEqual(seen, sorted((bill.id for bill in self.bills), reverse=True))
+        self.assertEqual(sizes, [2, 2, 1])
+        second = self.page(limit=2, cursor=self.page(limit=2)['next'])
+        back = self.page(limit=2, cursor=second['prev'])
+        self.assertEqual([row['id'] for row in back['results']], seen[:2])
+
+    def test_invalid_cursor_is_rejected(self):
+        self.assertEqual(self.client.get(self.url, {'cursor': 'garbage'}).status_code, 400)
+
+    def test_stats_cover_every_bill(self):
+        stats = self.page()['stats']
+        self.assertEqual(stats['bill_count'], 5)
+        self.assertEqual(Decimal(stats['lifetime_spend']), Decimal('37.50'))
+        self.assertEqual(Decimal(stats['average_basket']), Decimal('7.50'))
+        self.assertIsNotNone(stats['first_purchase_at'])
+        self.assertIsNotNone(stats['last_purchase_at'])
+
+    def test_customer_without_bills_has_empty_stats(self):
+        customer = Customer.objects.create(name='Bo', email='bo@example.com', phone='300')
+        data = self.client.get(f'/api/inventory/customer/{customer.id}/history/').json()
+        self.assertEqual(data['results'], [])
+        self.assertEqual(data['stats']['bill_count'], 0)
+        self.assertEqual(Decimal(data['stats']['lifetime_spend']), Decimal('0'))
+        self.assertIsNone(data['stats']['last_purchase_at'])
+
+    def test_unchanged_history_is_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        # Each page has its own validator
+        self.assertNotEqual(self.client.get(self.url, {'limit': 2})['ETag'], etag)
+
+    def test_new_bill_changes_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        self.bill(self.customer, 1)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['stats']['bill_count'], 6)
+
+
+class SyncTests(TestCase):
+    def setUp(self):
+        self.past = timezone.now() - timedelta(minutes=5)
+
+    def sync_all(self, token=None, limit=2):
+        # Follows has_more the way a client would; returns (pages, last watermark)
+        pages = []
+        while True:
+            data = changes_since(token, limit)
+            pages.append(data)
+            token = data['watermark']
+            if not data['has_more']:
+                return pages, token
+
+    def test_deletions_are_keyed_by_stream_name(self):
+        item = Inventory.objects.create(name='Lamp', quantity=5, price=Decimal('3.00'))
+        customer = Customer.objects.create(name='Ana', phone='1', email='ana@example.com')
+        item_id, customer_id = item.id, customer.id
+        item.delete()
+        customer.delete()
+        with self.settings(IBMS_SYNC_SETTLE_SECONDS=0):
+            deleted = changes_since()['deleted']
+        self.assertLessEqual(set(deleted), set(STREAMS))
+        self.assertEqual(deleted['inventory'], [item_id])
+        self.assertEqual(deleted['customers'], [customer_id])
+
+    def test_timestamp_ties_span_pages_without_gaps_or_repeats(self):
+        items = [Inventory.objects.create(name=f'Item {i}', quantity=1, price=Decimal('1.00')) for i in range(5)]
+        customers = [
+            Customer.objects.create(name=f'C{i}', phone=str(i), email=f'c{i}@example.com') for i in range(3)
+        ]
+        customer_ids = [customer.id for customer in customers]
+        for customer in customers:
+            customer.delete()
+        Inventory.objects.update(updated_at=self.past)
+        Tombstone.objects.update(deleted_at=self.past)
+        pages, _ = self.sync_all(limit=2)
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(
+            [row['id'] for page in pages for row in page['inventory']], sorted(item.id for item in items),
+        )
+        self.assertEqual([id for page in pages for id in page['deleted']['customers']], customer_ids)
+
+    def test_recent_rows_wait_for_the_settle_horizon(self):
+        old = Inventory.objects.create(name='Old', quantity=1, price=Decimal('1.00'))
+        Inventory.objects.filter(id=old.id).update(updated_at=self.past)
+        new = Inventory.objects.create(name='New', quantity=1, price=Decimal('1.00'))
+        with self.settings(IBMS_SYNC_SETTLE_SECONDS=60):
+            data = changes_since()
+            self.assertEqual([row['id'] for row in data['inventory']], [old.id])
+            self.assertFalse(data['has_more'])
+            # The watermark stays behind the held-back row, so it is sent once it settles
+            Inventory.objects.filter(id=new.id).update(updated_at=self.past + timedelta(minutes=1))
+            later = changes_since(data['watermark'])
+        self.assertEqual([row['id'] for row in later['inventory']], [new.id])
+
+    def test_watermark_resumes_after_the_last_change(self):
+        items = [Inventory.objects.create(name=f'Item {i}', quantity=1, price=Decimal('1.00')) for i in range(3)]
+        Inventory.objects.update(updated_at=self.past)
+        _, token = self.sync_all()
+        data = changes_since(token)
+        self.assertEqual(data['inventory'], [])
+        self.assertEqual(data['watermark'], token)
+        Inventory.objects.filter(id=items[1].id).update(updated_at=self.past + timedelta(minutes=1))
+        self.assertEqual([row['id'] for row in changes_since(token)['inventory']], [items[1].id])
+
+    def test_watermark_round_trip(self):
+        positions = {'inventory': (self.past, 7), 'deleted': (self.past, 3)}
+        self.assertEqual(decode_watermark(encode_watermark(positions)), positions)
+
+    def test_invalid_watermarks_are_rejected(self):
+        unknown_stream = encode_watermark({'orders': (self.past, 1)})
+        bad_id = encode_watermark({'inventory': (self.past, 'x')})
+        for token in ['garbage', unknown_stream, bad_id]:
+            with self.subTest(token=token):
+                with self.assertRaises(InvalidWatermark):
+                    decode_watermark(token)
+                response = self.client.get('/api/inventory/sync/', {'since': token})
+                self.assertEqual(response.status_code, 400)
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    A second alias mirroring the test database stands in for the
+    replica, so queries can be counted per alias. It is added after the
+    runner has set up the databases, which is why it joins `databases`
+    only then. TransactionTestCase because reads inside an open
+    transaction are meant to stay on the primary.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.added_replica = REPLICA not in connections.settings
+        if cls.added_replica:
+            primary = connections['default'].settings_dict
+            connections.settings[REPLICA] = {**primary, 'TEST': {**primary['TEST'], 'MIRROR': 'default'}}
+        cls.databases = {'default', REPLICA}
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.added_replica:
+            connections[REPLICA].close()
+            del connections[REPLICA]
+            del connections.settings[REPLICA]
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.item = Inventory.objects.create(name='Lamp', sku='L-1', quantity=5, price=Decimal('3.00'))
+
+    def queries(self, fetch):
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections[REPLICA]) as replica:
+            fetch()
+        return len(primary), len(replica)
+
+    def test_reads_go_to_the_replica(self):
+        for url in ('/api/inventory/list/', '/api/inventory/search/inventory/?q=lamp'):
+            with self.subTest(url=url):
+                primary, replica = self.queries(lambda: self.assertEqual(self.client.get(url).status_code, 200))
+                self.assertEqual(primary, 0)
+                self.assertGreater(replica, 0)
+
+    def test_streamed_export_reads_from_the_replica(self):
+        def fetch():
+            response = self.client.get('/api/inventory/export/inventory/')
+            self.assertIn(b'Lamp', b''.join(response.streaming_content))
+        primary, replica = self.queries(fetch)
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    def test_report_misses_read_from_the_replica(self):
+        url = '/api/inventory/reports/inventory-status/'
+        primary, replica = self.queries(lambda: self.assertEqual(self.client.get(url)['X-Cache'], 'MISS'))
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+        primary, replica = self.queries(lambda: self.assertEqual(self.client.get(url)['X-Cache'], 'HIT'))
+        self.assertEqual((primary, replica), (0, 0))
+
+    def test_reads_stay_on_the_primary_after_a_write(self):
+        def fetch_customers():
+            response = self.client.get('/api/inventory/customers/')
+            self.assertEqual([row['name'] for row in response.json()], ['Ana'])
+
+        response = self.client.post(
+            '/api/inventory/customers/add/', {'name': 'Ana', 'email': 'ana@example.com', 'phone': '1'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201)
+        primary, replica = self.queries(fetch_customers)
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+        self.assertEqual(self.client.delete(f'/api/inventory/{self.item.id}/').status_code, 200)
+        primary, replica = self.queries(
+            lambda: self.assertEqual(self.client.get('/api/inventory/list/').json(), []),
+        )
+        self.assertEqual(replica, 0)
+
+        # Once the window has passed the replica is used again
+        cache.delete(RECENT_WRITE_KEY)
+        primary, replica = self.queries(fetch_customers)
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    def test_writes_and_transactions_stay_on_the_primary(self):
+        @replica_reads
+        def view(request):
+            Inventory.objects.create(name='Kettle', quantity=1, price=Decimal('9.00'))
+            with transaction.atomic():
+                self.assertEqual(Inventory.objects.count(), 2)
+            return HttpResponse()
+
+        primary, replica = self.queries(lambda: view(None))
+        self.assertEqual(replica, 0)
+        self.assertGreater(primary, 0)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        items = [Inventory.objects.create(name=f'Item {i}', quantity=1, price=Decimal('1.00')) for i in range(7)]
+        # Equal sort values across page boundaries, so only the id breaks ties
+        Inventory.objects.update(created_at=items[0].created_at)
+        self.ids = sorted((item.id for item in items), reverse=True)
+
+    def page(self, **params):
+        response = self.client.get('/api/inventory/list/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_pages_cover_ties_without_gaps_or_repeats(self):
+        seen, pages = [], []
+        data = self.page(limit=3)
+        while True:
+            pages.append(data)
+            seen += [row['id'] for row in data['results']]
+            if not data['next']:
+                break
+            data = self.page(limit=3, cursor=data['next'])
+        self.assertEqual(seen, self.ids)
+        self.assertEqual([len(page['results']) for page in pages], [3, 3, 1])
+        self.assertIsNone(pages[0]['prev'])
+
+    def test_prev_returns_the_previous_page(self):
+        first = self.page(limit=3)
+        second = self.page(limit=3, cursor=first['next'])
+        back = self.page(limit=3, cursor=second['prev'])
+        self.assertEqual(back['results'], first['results'])
+        self.assertIsNone(back['prev'])
+        self.assertEqual(back['next'], first['next'])
+
+    def test_without_limit_or_cursor_the_full_list_is_returned(self):
+        self.assertEqual([row['id'] for row in self.page()], self.ids)
+
+    def test_bad_cursor_or_limit_is_rejected(self):
+        for params in ({'cursor': 'not-a-cursor'}, {'limit': 'ten'}):
+            with self.subTest(params=params):
+                response = self.client.get('/api/inventory/list/', params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        customer = Customer.objects.create(name='Ada', email='ada@example.com', phone='100')
+        item = Inventory.objects.create(name='Lamp', quantity=50, price=Decimal('2.50'))
+        self.bills = [
+            billing.create_bill(customer.id, [{'inventory_id': item.id, 'quantity': 1, 'price': '2.50'}])
+            for _ in range(3)
+        ]
+        Bill.objects.filter(id=self.bills[0].id).update(date=timezone.now() - timedelta(days=30))
+
+    def lines(self, response):
+        self.assertTrue(response.streaming)
+        return [chunk.decode() for chunk in response.streaming_content]
+
+    def test_csv_has_a_header_and_one_line_per_row(self):
+        # Several fetches from the server-side cursor
+        with mock.patch.object(exports, 'CHUNK_SIZE', 2):
+            response = self.client.get('/api/inventory/export/bills/')
+            lines = self.lines(response)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('bills.csv', response['Content-Disposition'])
+        self.assertEqual(lines[0], 'id,date,total,customer_id,customer_name\r\n')
+        ids = [int(line.split(',')[0]) for line in lines[1:]]
+        self.assertEqual(ids, sorted((bill.id for bill in self.bills), reverse=True))
+        self.assertTrue(lines[1].rstrip().endswith(',2.50,%d,Ada' % self.bills[0].customer_id))
+
+    def test_ndjson_rows_are_objects(self):
+        response = self.client.get('/api/inventory/export/bill-items/', {'format': 'ndjson'})
+        rows = [json.loads(line) for line in self.lines(response)]
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]['item_name'], 'Lamp')
+        self.assertEqual(Decimal(rows[0]['line_total']), Decimal('2.50'))
+
+    def test_date_filter(self):
+        start = (timezone.now() - timedelta(days=1)).date().isoformat()
+        lines = self.lines(self.client.get('/api/inventory/export/bills/', {'start_date': start}))
+        self.assertEqual(len(lines), 3)
+
+    def test_bad_dates_are_rejected(self):
+        for url in ('/api/inventory/export/bills/', '/api/inventory/export/bill-pdfs/', '/api/inventory/bills/'):
+            for params in ({'start_date': 'bad'}, {'end_date': '2026-02-30'}):
+                with self.subTest(url=url, params=params):
+                    response = self.client.get(url, params)
+                    self.assertEqual(response.status_code, 400)
+                    self.assertIn('must be a date', response.json()['error'])
+
+
+class SalesTrendTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for day, total in (('2026-03-02', 10), ('2026-03-04', 5), ('2026-03-10', 7), ('2026-04-01', 3)):
+            DailySales.objects.create(day=date.fromisoformat(day), total=Decimal(total), bill_count=1)
+
+    def trend(self, start, end, granularity):
+        rows = sales_trend(date.fromisoformat(start), date.fromisoformat(end), granularity)
+        return [(row['date'], row['sales']) for row in rows]
+
+    def test_days_without_sales_are_zero(self):
+        self.assertEqual(self.trend('2026-03-01', '2026-03-05', 'day'), [
+            ('2026-03-01', 0.0), ('2026-03-02', 10.0), ('2026-03-03', 0.0), ('2026-03-04', 5.0), ('2026-03-05', 0.0),
+        ])
+
+    def test_weeks_start_on_monday(self):
+        self.assertEqual(self.trend('2026-03-02', '2026-03-22', 'week'), [
+            ('2026-03-02', 15.0), ('2026-03-09', 7.0), ('2026-03-16', 0.0),
+        ])
+
+    def test_months(self):
+        self.assertEqual(self.trend('2026-02-01', '2026-04-30', 'month'), [
+            ('2026-02-01', 0.0), ('2026-03-01', 22.0), ('2026-04-01', 3.0),
+        ])
+
+    def test_endpoint(self):
+        response = self.client.get(
+            '/api/inventory/reports/sales-trend/', {'start': '2026-03-01', 'end': '2026-03-31', 'granularity': 'month'},
+        )
+        self.assertEqual(response.json(), [{'date': '2026-03-01', 'sales': 22.0}])
+
+    def test_bad_params_are_rejected(self):
+        for params in (
+            {'granularity': 'year'},
+            {'start': '03/01/2026'},
+            {'start': '2026-03-10', 'end': '2026-03-01'},
+        ):
+            with self.subTest(params=params):
+                response = self.client.get('/api/inventory/reports/sales-trend/', params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        customers = [Customer.objects.create(name=f'C{i}', email=f'c{i}@example.com', phone=str(i)) for i in range(2)]
+        items = [Inventory.objects.create(name=f'Item {i}', quantity=100, price=Decimal('2.50')) for i in range(3)]
+        for n, customer in enumerate(customers * 2):
+            billing.create_bill(customer.id, [
+                {'inventory_id': item.id, 'quantity': n + 1, 'price': str(item.price)} for item in items[n % 2:]
+            ])
+
+    def snapshot(self):
+        return (
+            sorted(DailySales.objects.values_list('day', 'total', 'bill_count')),
+            sorted(DailyProductSales.objects.values_list('day', 'inventory_id', 'units', 'revenue')),
+            sorted(CustomerStats.objects.values_list(
+                'customer_id', 'bill_count', 'lifetime_spend', 'first_purchase_at', 'last_purchase_at',
+            )),
+        )
+
+    def test_incremental_updates_match_a_rebuild(self):
+        self.assertEqual(rollups.verify_rollups(), [])
+        self.assertEqual(rollups.verify_customer_stats(), [])
+        recorded = self.snapshot()
+        rollups.rebuild_rollups()
+        rollups.rebuild_customer_stats()
+        self.assertEqual(self.snapshot(), recorded)
+
+    def test_verify_reports_drift_and_rebuild_repairs_it(self):
+        DailySales.objects.update(bill_count=F('bill_count') + 1)
+        DailyProductSales.objects.filter(id=DailyProductSales.objects.first().id).delete()
+        CustomerStats.objects.filter(customer_id=CustomerStats.objects.first().customer_id).update(bill_count=99)
+        self.assertEqual(len(rollups.verify_rollups()), 2)
+        self.assertEqual(len(rollups.verify_customer_stats()), 1)
+        rollups.rebuild_rollups()
+        rollups.rebuild_customer_stats()
+        self.assertEqual(rollups.verify_rollups(), [])
+        self.assertEqual(rollups.verify_customer_stats(), [])
+
+
+class ReportCacheTests(TestCase):
+    url = '/api/inventory/reports/summary/'
+
+    def setUp(self):
+        cache.clear()
+        self.customer = Customer.objects.create(name='Ada', email='ada@example.com', phone='100')
+        self.item = Inventory.objects.create(name='Lamp', quantity=50, price=Decimal('2.50'))
+
+    def test_writes_invalidate_cached_reports(self):
+        self.assertEqual(self.client.get(self.url)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(self.url)['X-Cache'], 'HIT')
+        with self.captureOnCommitCallbacks(execute=True):
+            created = self.client.post('/api/inventory/bill/create/', {
+                'customer_id': self.customer.id,
+                'items': [{'inventory_id': self.item.id, 'quantity': 2, 'price': '2.50'}],
+            }, content_type='application/json')
+        self.assertEqual(created.status_code, 201)
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['transactions'], 1)
+        self.assertEqual(self.client.get(self.url)['X-Cache'], 'HIT')
+
+    def test_nothing_is_invalidated_before_commit(self):
+        before = data_generation()
+        with self.captureOnCommitCallbacks() as callbacks:
+            bump_data_generation()
+        self.assertEqual(data_generation(), before)
+        callbacks[0]()
+        self.assertEqual(data_generation(), before + 1)
+
+    def test_evicted_generation_does_not_revive_old_entries(self):
+        self.client.get(self.url)
+        before = data_generation()
+        cache.delete(GENERATION_KEY)
+        self.assertGreater(data_generation(), before)
+        self.assertEqual(self.client.get(self.url)['X-Cache'], 'MISS')
+
+
+class BillPdfCacheTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings = self.settings(IBMS_PDF_CACHE_DIR=self.directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.customer = Customer.objects.create(name='Ada', email='ada@example.com', phone='100')
+        item = Inventory.objects.create(name='Lamp', quantity=10, price=Decimal('10.00'))
+        self.bills = [
+            billing.create_bill(self.customer.id, [{'inventory_id': item.id, 'quantity': 1, 'price': '10.00'}])
+            for _ in range(3)
+        ]
+
+    def get(self, bill, **headers):
+        response = self.client.get(f'/api/inventory/bill/{bill.id}/pdf/', headers=headers)
+        if response.streaming:
+            response.content_bytes = b''.join(response.streaming_content)
+            response.close()
+        return response
+
+    def pdf_files(self):
+        return sorted(name for name in os.listdir(self.directory) if name.endswith('.pdf'))
+
+    def test_etag_and_not_modified(self):
+        response = self.get(self.bills[0])
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_bytes.startswith(b'%PDF'))
+        etag = response['ETag']
+        with mock.patch.object(pdfs, 'render_bill_pdf') as render:
+            response = self.get(self.bills[0], if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        render.assert_not_called()
+
+    def test_hits_are_served_from_disk(self):
+        first = self.get(self.bills[0]).content_bytes
+        with mock.patch.object(pdfs, 'render_bill_pdf') as render, \
+                mock.patch.object(pdfs.BillPdfCache, 'evict') as evict:
+            self.assertEqual(self.get(self.bills[0]).content_bytes, first)
+        render.assert_not_called()
+        evict.assert_not_called()
+
+    def test_changed_bill_replaces_its_pdf(self):
+        etag = self.get(self.bills[0])['ETag']
+        self.customer.name = 'Ada Lovelace'
+        self.customer.save()
+        response = self.get(self.bills[0], if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(self.pdf_files()), 1)
+
+    def test_misses_under_the_limit_do_not_scan(self):
+        self.get(self.bills[0])
+        with mock.patch.object(pdfs.BillPdfCache, 'evict') as evict:
+            self.get(self.bills[1])
+        evict.assert_not_called()
+
+    def test_least_recently_used_is_evicted(self):
+        loaded = [billing.load_bill(bill.id) for bill in self.bills]
+        cache = pdfs.BillPdfCache(self.directory)
+        paths = [cache.path_for(bill.id, pdfs.bill_content_hash(bill, items)) for bill, items in loaded]
+        for bill, items in loaded[:2]:
+            cache.open(bill, items).close()
+        size = paths[0].stat().st_size
+        # Bill 1 becomes the least recently used
+        os.utime(paths[1], (1, 1))
+        pdfs.BillPdfCache(self.directory, max_bytes=2 * size + size // 2).open(*loaded[2]).close()
+        self.assertEqual([path.exists() for path in paths], [True, False, True])
+
+
+class RecognitionCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'recognition.json')
+
+    def test_nearest_match_within_the_threshold(self):
+        cache = RecognitionCache(max_distance=6)
+        key = 0x0123456789ABCDEF
+        cache.set(key ^ 0b111, {'name': 'three bits off'})
+        cache.set(key ^ 0b1, {'name': 'one bit off'})
+        self.assertEqual(cache.get(key), ({'name': 'one bit off'}, 1))
+        self.assertEqual(cache.get(key ^ 0b1 ^ (0b111111 << 40))[1], 6)
+        self.assertEqual(cache.get(key ^ 0b1 ^ (0b1111111 << 40)), (None, None))
+
+    def test_index_finds_what_a_full_scan_finds(self):
+        rng = random.Random(7)
+        cache = RecognitionCache(max_entries=500, max_distance=6)
+        keys = [rng.getrandbits(64) for _ in range(500)]
+        for key in keys:
+            cache.set(key, {'key': key})
+        for _ in range(300):
+            probe = rng.choice(keys)
+            for bit in rng.sample(range(64), rng.randint(0, 8)):
+                probe ^= 1 << bit
+            distances = [bin(key ^ probe).count('1') for key in keys]
+            nearest = min(distances)
+            self.assertEqual(cache.get(probe)[1], nearest if nearest <= 6 else None)
+
+    def test_entries_expire(self):
+        cache = RecognitionCache(ttl=10)
+        with mock.patch('time.time', return_value=1000):
+            cache.set(42, {'name': 'Lamp'})
+        with mock.patch('time.time', return_value=1010):
+            self.assertEqual(cache.get(42)[0], {'name': 'Lamp'})
+        with mock.patch('time.time', return_value=1011):
+            self.assertEqual(cache.get(42), (None, None))
+        self.assertEqual(cache.stats()['entries'], 0)
+
+    def test_least_recently_used_is_dropped(self):
+        cache = RecognitionCache(max_entries=2, max_distance=0)
+        cache.set(1, 'one')
+        cache.set(2, 'two')
+        cache.get(1)
+        cache.set(3, 'three')
+        self.assertEqual([cache.get(key)[0] for key in (1, 2, 3)], ['one', None, 'three'])
+
+    def test_inserts_are_appended_and_survive_a_restart(self):
+        cache = RecognitionCache(max_entries=3, path=self.path)
+        for key in range(1, 4):
+            cache.set(key << 32, {'key': key})
+        with open(self.path) as f:
+            self.assertEqual(len(f.readlines()), 3)
+        restarted = RecognitionCache(max_entries=3, path=self.path)
+        self.assertEqual(restarted.get(2 << 32), ({'key': 2}, 0))
+
+    def test_file_is_compacted(self):
+        cache = RecognitionCache(max_entries=2, path=self.path)
+        for key in range(1, 6):
+            cache.set(key << 32, {'key': key})
+        with open(self.path) as f:
+            self.assertLessEqual(len(f.readlines()), 4)
+        restarted = RecognitionCache(max_entries=2, path=self.path)
+        self.assertEqual(list(restarted.entries), [4 << 32, 5 << 32])
+
+    def test_loads_the_old_single_array_format(self):
+        with open(self.path, 'w') as f:
+            json.dump([[f'{7:016x}', time.time(), {'name': 'Lamp'}]], f)
+        self.assertEqual(RecognitionCache(path=self.path).get(7)[0], {'name': 'Lamp'})
+
+
+class FakeVisionClient:
+    """Answers with the decoded payload; slower for earlier images so they finish last."""
+
+    def __init__(self):
+        self.calls = []
+
+    async def recognize(self, image_bytes):
+        self.calls.append(image_bytes)
+        text = image_bytes.decode()
+        if text == 'broken':
+            raise GeminiError({'error': 'Upstream failed.'}, status=502)
+        await asyncio.sleep(0.05 / len(self.calls))
+        return {'name': text, 'description': f'A {text}'}
+
+
+class RecognizeBatchTests(SimpleTestCase):
+    def setUp(self):
+        self.client_stub = FakeVisionClient()
+        for target, value in (
+            ('get_async_gemini_client', lambda: self.client_stub),
+            ('get_recognition_cache', lambda: RecognitionCache()),
+        ):
+            patcher = mock.patch.object(recognition, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def recognize(self, *texts):
+        images = [base64.b64encode(text.encode()).decode() for text in texts]
+        response = self.client.post('/api/inventory/ai/recognize-items/', {'images': images}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_results_keep_input_order(self):
+        results = self.recognize('lamp', 'kettle', 'mug')
+        self.assertEqual([result['name'] for result in results], ['lamp', 'kettle', 'mug'])
+
+    def test_duplicates_share_one_call(self):
+        results = self.recognize('lamp', 'mug', 'lamp')
+        self.assertEqual(sorted(self.client_stub.calls), [b'lamp', b'mug'])
+        self.assertEqual(results[0], results[2])
+
+    def test_one_failure_does_not_fail_the_batch(self):
+        results = self.recognize('lamp', 'broken', '')
+        self.assertEqual(results[0]['name'], 'lamp')
+        self.assertEqual(results[1], {'error': 'Upstream failed.'})
+        self.assertIn('error', results[2])
+
+
+class InventoryImportTests(TestCase):
+    def test_csv_reader_skips_the_byte_order_mark(self):
+        data = '\ufeffsku,name,quantity\r\nA-1,"Lamp, large",3\r\n'.encode()
+        self.assertEqual(list(imports.iter_csv(io.BytesIO(data))), [{'sku': 'A-1', 'name': 'Lamp, large', 'quantity': '3'}])
+
+    def test_ndjson_reader_ignores_blank_lines(self):
+        data = b'{"sku": "A-1"}\n\n{"sku": "A-2"}\n'
+        self.assertEqual(list(imports.iter_ndjson(io.BytesIO(data))), [{'sku': 'A-1'}, {'sku': 'A-2'}])
+
+    def test_json_array_is_read_in_pieces(self):
+        rows = [{'sku': f'A-{i}', 'name': 'x' * 40} for i in range(50)]
+        data = json.dumps(rows).encode()
+        with mock.patch.object(imports, 'READ_SIZE', 16):
+            self.assertEqual(list(imports.iter_json_array(io.BytesIO(data))), rows)
+
+    def test_json_reader_rejects_bad_input(self):
+        for data in (b'{"sku": "A-1"}', b'[{"sku": "A-1"}, {"sku"'):
+            with self.subTest(data=data), self.assertRaises(ValueError):
+                list(imports.iter_json_array(io.BytesIO(data)))
+
+    def test_quantity_must_be_a_whole_number(self):
+        for quantity in (1.7, '2.5', -1, 'many', 'NaN', 'Infinity', 2 ** 31):
+            with self.subTest(quantity=quantity):
+                _values, errors = imports.clean_inventory_row({'sku': 'A', 'name': 'Lamp', 'quantity': quantity})
+                self.assertIn('quantity', errors)
+        for quantity, expected in ((3, 3), (4.0, 4), ('5', 5), ('', 0)):
+            values, _errors = imports.clean_inventory_row({'sku': 'A', 'name': 'Lamp', 'quantity': quantity})
+            self.assertEqual(values['quantity'], expected)
+
+    def test_rows_are_upserted_by_sku(self):
+        Inventory.objects.create(sku='A-1', name='Old', quantity=1, price=Decimal('1.00'))
+        result = imports.import_inventory([
+            {'sku': 'A-1', 'name': 'Lamp', 'quantity': 5, 'price': '2.50'},
+            {'sku': 'A-2', 'name': 'Mug', 'quantity': 1.7, 'price': '1'},
+            {'sku': 'A-3', 'name': 'Kettle', 'quantity': 2, 'price': '9'},
+            {'sku': 'A-3', 'name': 'Kettle XL', 'quantity': 3, 'price': '12'},
+        ], chunk_size=2)
+        self.assertEqual((result.rows, result.inserted, result.updated, result.failed), (4, 1, 2, 1))
+        self.assertEqual(result.errors[0]['row'], 2)
+        self.assertEqual(
+            sorted(Inventory.objects.values_list('sku', 'name', 'quantity')),
+            [('A-1', 'Lamp', 5), ('A-3', 'Kettle XL', 3)],
+        )
+
+    def test_database_error_only_fails_the_bad_rows(self):
+        bulk_create = Inventory.objects.bulk_create
+
+        def failing(objs, **kwargs):
+            if any(obj.sku == 'BAD' for obj in objs):
+                raise DatabaseError('value out of range')
+            return bulk_create(objs, **kwargs)
+
+        rows = [{'sku': sku, 'name': 'Item', 'quantity': 1, 'price': '1'} for sku in ('A-1', 'BAD', 'A-2')]
+        with mock.patch.object(Inventory.objects, 'bulk_create', side_effect=failing):
+            result = imports.import_inventory(rows)
+        self.assertEqual((result.inserted, result.failed), (2, 1))
+        self.assertEqual(result.errors, [{'row': 2, 'errors': {'database': 'value out of range'}}])
+        self.assertEqual(sorted(Inventory.objects.values_list('sku', flat=True)), ['A-1', 'A-2'])
+
+    def test_endpoint(self):
+        upload = SimpleUploadedFile('items.csv', b'sku,name,quantity,price\nA-1,Lamp,2,3.50\nA-2,,1,1\n')
+        response = self.client.post('/api/inventory/import/', {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['rows'], data['inserted'], data['failed']), (2, 1, 1))
+        self.assertEqual(data['errors'][0]['errors'], {'name': 'This field is required.'})
+        upload = SimpleUploadedFile('items.txt', b'')
+        self.assertEqual(self.client.post('/api/inventory/import/', {'file': upload}).status_code, 400)
+
+
+class CustomerImportTests(TestCase):
+    def setUp(self):
+        self.ada = Customer.objects.create(name='Ada', email='ada@example.com', phone='100')
+        self.bob = Customer.objects.create(name='Bob', email='bob@example.com', phone='200')
+
+    def run_import(self, rows, on_existing='skip', chunk_size=1000):
+        rows = [dict(zip(('name', 'email', 'phone'), row)) for row in rows]
+        return imports.import_customers(rows, on_existing=on_existing, chunk_size=chunk_size).as_dict()
+
+    def counts(self, result):
+        return {key: result[key] for key in ('inserted', 'updated', 'skipped', 'conflicts', 'failed')}
+
+    def test_repeats_in_the_input_are_skipped(self):
+        result = self.run_import([
+            ('Cy', 'cy@example.com', '300'),
+            ('Cy again', 'cy@example.com', '301'),
+            ('Di', 'di@example.com', '300'),
+            ('Bad', 'not-an-email', '400'),
+        ])
+        self.assertEqual(self.counts(result), {'inserted': 1, 'updated': 0, 'skipped': 2, 'conflicts': 0, 'failed': 1})
+
+    def test_existing_customers_are_skipped_by_default(self):
+        result = self.run_import([('Ada L', 'ada@example.com', '101'), ('Bob B', 'bob2@example.com', '200')])
+        self.assertEqual(self.counts(result), {'inserted': 0, 'updated': 0, 'skipped': 2, 'conflicts': 0, 'failed': 0})
+        self.ada.refresh_from_db()
+        self.assertEqual(self.ada.name, 'Ada')
+
+    def test_update_mode_overwrites_the_match(self):
+        result = self.run_import([('Ada L', 'ada@example.com', '101')], on_existing='update')
+        self.assertEqual(result['updated'], 1)
+        self.ada.refresh_from_db()
+        self.assertEqual((self.ada.name, self.ada.phone), ('Ada L', '101'))
+
+    def test_keys_of_two_customers_conflict(self):
+        result = self.run_import([('Mix', 'ada@example.com', '200')], on_existing='update')
+        self.assertEqual(result['conflicts'], 1)
+        self.assertIn(f'customer {self.ada.id}', result['errors'][0]['conflict'])
+
+    def test_second_row_for_the_same_customer_conflicts(self):
+        for chunk_size in (1000, 1):
+            with self.subTest(chunk_size=chunk_size):
+                Customer.objects.filter(id=self.ada.id).update(name='Ada', email='ada@example.com', phone='100')
+                result = self.run_import([
+                    ('Ada by email', 'ada@example.com', '555'),
+                    ('Ada by phone', 'ada2@example.com', '100'),
+                ], on_existing='update', chunk_size=chunk_size)
+                self.assertEqual((result['updated'], result['conflicts']), (1, 1))
+                self.assertEqual(result['errors'], [
+                    {'row': 2, 'conflict': f'customer {self.ada.id} was already updated by an earlier row.'},
+                ])
+                self.ada.refresh_from_db()
+                self.assertEqual((self.ada.name, self.ada.email, self.ada.phone), ('Ada by email', 'ada@example.com', '555'))
+
+    def test_endpoint(self):
+        upload = SimpleUploadedFile('customers.ndjson', b'{"name": "Ada L", "email": "ada@example.com", "phone": "1"}\n')
+        response = self.client.post('/api/inventory/customers/import/', {'file': upload, 'on_existing': 'update'})
+        self.assertEqual(response.json()['updated'], 1)
+        upload = SimpleUploadedFile('customers.ndjson', b'')
+        response = self.client.post('/api/inventory/customers/import/', {'file': upload, 'on_existing': 'merge'})
+        self.assertEqual(response.status_code, 400)
+
+
+POSTGRES = connection.vendor == 'postgresql'
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        for name, description in (
+            ('Desk Lamp', 'Adjustable arm'),
+            ('Lamp', 'Plain'),
+            ('Lampshade', 'Linen'),
+            ('Torch', 'Brighter than a lamp'),
+            ('Wireless Speaker', 'Bluetooth'),
+        ):
+            Inventory.objects.create(name=name, description=description, quantity=1, price=Decimal('1.00'))
+
+    def names(self, term, entity='inventory'):
+        return [row['name'] for row in run_search(entity, term)]
+
+    @skipIf(POSTGRES, 'Postgres ranks by trigram similarity')
+    def test_fallback_ranks_exact_then_prefix_then_contains_then_description(self):
+        self.assertEqual(self.names('lamp'), ['Lamp', 'Lampshade', 'Desk Lamp', 'Torch'])
+        ranks = [row['rank'] for row in run_search('inventory', 'LAMP')]
+        self.assertEqual(ranks, [1.0, 0.8, 0.6, 0.3])
+
+    @skipIf(POSTGRES, 'Postgres ranks by trigram similarity')
+    def test_fallback_has_no_typo_tolerance(self):
+        self.assertEqual(self.names('speakr'), [])
+
+    @skipUnless(POSTGRES, 'typo tolerance needs pg_trgm')
+    def test_typos_still_match(self):
+        self.assertEqual(self.names('speakr'), ['Wireless Speaker'])
+
+    def test_customers_match_on_phone_below_name(self):
+        Customer.objects.create(name='Ana 555', email='a@example.com', phone='100')
+        Customer.objects.create(name='Ben', email='b@example.com', phone='555-0100')
+        self.assertEqual(self.names('555', 'customers'), ['Ana 555', 'Ben'])
+
+    def test_bills_by_number(self):
+        customer = Customer.objects.create(name='Ada', email='ada@example.com', phone='100')
+        item = Inventory.objects.get(name='Lamp')
+        bill = billing.create_bill(customer.id, [{'inventory_id': item.id, 'quantity': 1, 'price': '1.00'}])
+        self.assertEqual([row['id'] for row in run_search('bills', str(bill.id))], [bill.id])
+        self.assertEqual([row['customer'] for row in run_search('bills', 'ad')], ['Ada'])
+
+    def test_endpoint_errors(self):
+        self.assertEqual(self.client.get('/api/inventory/search/widgets/', {'q': 'x'}).status_code, 404)
+        self.assertEqual(self.client.get('/api/inventory/search/inventory/').json(), {'results': []})
+        response = self.client.get('/api/inventory/search/inventory/', {'q': 'lamp', 'limit': 'all'})
+        self.assertEqual(response.status_code, 400)
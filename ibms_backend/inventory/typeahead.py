@@ -0,0 +1,285 @@
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import _generation, _incr_generation
+from .models import Customer, Inventory
+
+GENERATION_KEY = 'ibms:typeahead-generation'
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+CENTS = Decimal('0.01')
+
+
+def normalize(text):
+    return ' '.join(str(text or '').casefold().split())
+
+
+class PrefixIndex:
+    """
+    Records searchable by key prefix.
+
+    Keys live in sorted (key, id) lists, one per tier, so a lookup is a
+    bisect plus a walk over at most `limit` entries. Tier 0 holds the
+    keys a match should rank first (whole name, phone, SKU); tier 1 the
+    remaining words of the name.
+    """
+
+    def __init__(self, tiers=2):
+        self.tiers = [[] for _ in range(tiers)]
+        self.records = {}
+        self.keys = {}
+
+    def load(self, entries):
+        """Replace the contents with (id, record, keys_per_tier) entries."""
+        self.tiers = [[] for _ in self.tiers]
+        self.records = {}
+        self.keys = {}
+        for id, record, keys in entries:
+            self.records[id] = record
+            self.keys[id] = keys
+            for tier, tier_keys in zip(self.tiers, keys):
+                tier.extend((key, id) for key in tier_keys)
+        for tier in self.tiers:
+            tier.sort()
+
+    def add(self, id, record, keys):
+        self.remove(id)
+        self.records[id] = record
+        self.keys[id] = keys
+        for tier, tier_keys in zip(self.tiers, keys):
+            for key in tier_keys:
+                insort(tier, (key, id))
+
+    def remove(self, id):
+        keys = self.keys.pop(id, None)
+        if keys is None:
+            return
+        del self.records[id]
+        for tier, tier_keys in zip(self.tiers, keys):
+            for key in tier_keys:
+                index = bisect_left(tier, (key, id))
+                if index < len(tier) and tier[index] == (key, id):
+                    del tier[index]
+
+    def search(self, prefix, limit):
+        results = []
+        seen = set()
+        for tier in self.tiers:
+            index = bisect_left(tier, (prefix,))
+            while index < len(tier) and len(results) < limit:
+                key, id = tier[index]
+                if not key.startswith(prefix):
+                    break
+                if id not in seen:
+                    seen.add(id)
+                    results.append(self.records[id])
+                index += 1
+        return results
+
+
+def _name_keys(name, extra=()):
+    words = normalize(name).split()
+    first = [' '.join(words)] if words else []
+    return [first + [key for key in extra if key], words[1:]]
+
+
+def inventory_entry(values):
+    record = {
+        'id': values['id'],
+        'name': values['name'],
+        'sku': values['sku'],
+        # Instances saved from request data may still hold an int or float
+        'price': str(Decimal(str(values['price'])).quantize(CENTS)),
+    }
+    return values['id'], record, _name_keys(values['name'], [normalize(values['sku'])])
+
+
+def customer_entry(values):
+    record = {
+        'id': values['id'],
+        'name': values['name'],
+        'phone': values['phone'],
+        'email': values['email'],
+    }
+    digits = re.sub(r'\D', '', values['phone'] or '')
+    return values['id'], record, _name_keys(values['name'], [digits])
+
+
+SOURCES = {
+    'inventory': (Inventory, ['id', 'name', 'sku', 'price'], inventory_entry),
+    'customers': (Customer, ['id', 'name', 'phone', 'email'], customer_entry),
+}
+
+
+class Typeahead:
+    """
+    Process-wide typeahead over inventory and customer names.
+
+    Built on first use from one values() query per model and then kept
+    current by the model signals below. Writes that bypass signals
+    (bulk imports) call invalidate_typeahead(), which bumps a counter in
+    the default cache; once a lookup sees the counter has moved, the
+    index is reloaded.
+
+    That counter only reaches other worker processes when the cache is
+    shared (IBMS_CACHE_DIR, or another shared backend). With the default
+    per-process LocMemCache each worker only sees its own writes, so the
+    index is also reloaded once it is older than
+    settings.IBMS_TYPEAHEAD_MAX_AGE seconds, which bounds how stale
+    another worker's suggestions can get. The counter itself is read at
+    most every settings.IBMS_TYPEAHEAD_CHECK_SECONDS.
+
+    Except for the very first build, reloads run on a background thread
+    while lookups keep answering from the current index; the new one is
+    swapped in when complete, with any changes applied in the meantime
+    replayed onto it.
+    """
+
+    def __init__(self):
+        self.indexes = None
+        self.generation = None
+        self.built_at = None
+        self.checked_at = None
+        # Held briefly by lookups, apply() and the swap at the end of a rebuild
+        self.lock = threading.Lock()
+        # Held for a whole rebuild, so only one runs at a time
+        self.build_lock = threading.Lock()
+        # (kind, id, values, generation) applied while a rebuild loads
+        self.pending = None
+
+    def _shared_generation(self):
+        return _generation(GENERATION_KEY)
+
+    def _stale(self):
+        now = time.monotonic()
+        max_age = settings.IBMS_TYPEAHEAD_MAX_AGE
+        if max_age and now - self.built_at > max_age:
+            return True
+        if self.checked_at is not None and now - self.checked_at < settings.IBMS_TYPEAHEAD_CHECK_SECONDS:
+            return False
+        self.checked_at = now
+        return self._shared_generation() != self.generation
+
+    def _change(self, indexes, kind, id, values):
+        if values is None:
+            indexes[kind].remove(id)
+        else:
+            indexes[kind].add(*SOURCES[kind][2](values))
+
+    def _rebuild(self):
+        # Caller holds self.build_lock; lookups go on using the old index
+        with self.lock:
+            self.pending = []
+        try:
+            generation = self._shared_generation()
+            indexes = {}
+            for kind, (model, fields, entry) in SOURCES.items():
+                index = PrefixIndex()
+                index.load(entry(values) for values in model.objects.values(*fields).iterator())
+                indexes[kind] = index
+        except BaseException:
+            with self.lock:
+                self.pending = None
+            raise
+        with self.lock:
+            # The queries may have missed changes committed while they ran
+            for kind, id, values, change_generation in self.pending:
+                self._change(indexes, kind, id, values)
+                if change_generation == generation + 1:
+                    generation = change_generation
+            self.pending = None
+            self.indexes = indexes
+            self.generation = generation
+            self.built_at = self.checked_at = time.monotonic()
+
+    def _background_rebuild(self):
+        # Started with self.build_lock already held
+        try:
+            self._rebuild()
+        finally:
+            self.build_lock.release()
+            # Connections are per thread and this one is not reused
+            connections.close_all()
+
+    def rebuild(self):
+        with self.build_lock:
+            self._rebuild()
+
+    def suggest(self, kind, term, limit=DEFAULT_LIMIT):
+        if self.indexes is None:
+            # Nothing to answer from yet, so the first lookup builds inline
+            with self.build_lock:
+                if self.indexes is None:
+                    self._rebuild()
+        elif self._stale() and self.build_lock.acquire(blocking=False):
+            threading.Thread(target=self._background_rebuild, daemon=True).start()
+        prefix = normalize(term)
+        if not prefix:
+            return []
+        with self.lock:
+            return self.indexes[kind].search(prefix, limit)
+
+    def apply(self, kind, id, values=None):
+        """Apply one committed save (values) or delete (values=None)."""
+        generation = _incr_generation(GENERATION_KEY)
+        with self.lock:
+            if self.pending is not None:
+                self.pending.append((kind, id, values, generation))
+            if self.indexes is None:
+                return
+            self._change(self.indexes, kind, id, values)
+            # Still in sync unless another process wrote in between
+            if generation == self.generation + 1:
+                self.generation = generation
+
+
+typeahead = Typeahead()
+
+
+def invalidate_typeahead():
+    """Force a rebuild after bulk writes (in every process when the cache is shared)."""
+    transaction.on_commit(_invalidate)
+
+
+def _invalidate():
+    _incr_generation(GENERATION_KEY)
+    # Check the counter on the next lookup here rather than after the interval
+    typeahead.checked_at = None
+
+
+def _on_save(kind, instance):
+    fields = SOURCES[kind][1]
+    values = {field: getattr(instance, field) for field in fields}
+    transaction.on_commit(lambda: typeahead.apply(kind, instance.pk, values))
+
+
+def _on_delete(kind, id):
+    transaction.on_commit(lambda: typeahead.apply(kind, id))
+
+
+@receiver(post_save, sender=Inventory)
+def inventory_saved(sender, instance, **kwargs):
+    _on_save('inventory', instance)
+
+
+@receiver(post_delete, sender=Inventory)
+def inventory_deleted(sender, instance, **kwargs):
+    _on_delete('inventory', instance.pk)
+
+
+@receiver(post_save, sender=Customer)
+def customer_saved(sender, instance, **kwargs):
+    _on_save('customers', instance)
+
+
+@receiver(post_delete, sender=Customer)
+def customer_deleted(sender, instance, **kwargs):
+    _on_delete('customers', instance.pk)
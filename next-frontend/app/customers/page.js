@@ -11,6 +11,8 @@ export default function CustomersPage() {
   const [historyCustomer, setHistoryCustomer] = useState(null);
   const [history, setHistory] = useState([]);
   const [historyLoading, setHistoryLoading] = useState(false);
+  const [historyStats, setHistoryStats] = useState(null);
+  const [historyNext, setHistoryNext] = useState(null);
   const [billDetails, setBillDetails] = useState(null);
   const [billDetailsLoading, setBillDetailsLoading] = useState(false);
 
@@ -55,12 +57,23 @@ export default function CustomersPage() {
     setHistoryCustomer(customer);
     setHistoryLoading(true);
     setHistory([]);
+    setHistoryStats(null);
+    setHistoryNext(null);
     const res = await fetch(`http://localhost:8000/api/inventory/customer/${customer.id}/history/`);
     const data = await res.json();
-    setHistory(data);
+    setHistory(data.results || []);
+    setHistoryStats(data.stats || null);
+    setHistoryNext(data.next || null);
     setHistoryLoading(false);
   };
 
+  const handleMoreHistory = async () => {
+    const res = await fetch(`http://localhost:8000/api/inventory/customer/${historyCustomer.id}/history/?cursor=${historyNext}`);
+    const data = await res.json();
+    setHistory(prev => [...prev, ...(data.results || [])]);
+    setHistoryNext(data.next || null);
+  };
+
   const handleViewBillDetails = async (billId) => {
     setBillDetailsLoading(true);
     setBillDetails(null);
@@ -148,6 +161,12 @@ export default function CustomersPage() {
             <div className="bg-white dark:bg-zinc-900 p-6 rounded-2xl shadow-lg max-w-lg w-full relative">
               <button className="absolute top-2 right-2 text-gray-500 hover:text-gray-800 dark:hover:text-white" onClick={() => { setHistoryCustomer(null); setBillDetails(null); }}>&times;</button>
               <h2 className="text-xl font-bold mb-4">History for {historyCustomer.name}</h2>
+              {historyStats && historyStats.bill_count > 0 && (
+                <div className="mb-4 text-sm text-gray-600 dark:text-gray-300">
+                  {historyStats.bill_count} bills · Spent ₹{historyStats.lifetime_spend} · Avg ₹{historyStats.average_basket}
+                  {historyStats.last_purchase_at && <> · Last visit {new Date(historyStats.last_purchase_at).toLocaleDateString()}</>}
+                </div>
+              )}
               {historyLoading ? (
                 <div className="text-center text-gray-500">Loading...</div>
               ) : history.length === 0 ? (
@@ -184,6 +203,9 @@ export default function CustomersPage() {
                   </tbody>
                 </table>
               )}
+              {historyNext && (
+                <button className="text-blue-600 hover:underline text-sm mb-4" onClick={handleMoreHistory}>Load more</button>
+              )}
               {/* Bill Details Modal */}
               {billDetails && (
                 <div className="fixed inset-0 bg-black bg-opacity-40 flex items-center justify-center z-50">
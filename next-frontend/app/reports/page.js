@@ -43,11 +43,29 @@ export default function ReportsPage() {
       const res = await fetch("http://localhost:8000/api/inventory/reports/send-to-manager/", {
         method: "POST"
       });
-      if (res.ok) {
-        setSendMessage("Report sent to manager successfully.");
-      } else {
+      if (!res.ok) {
         setSendMessage("Failed to send report to manager.");
+        setSending(false);
+        return;
       }
+      // 202 only means the report is queued; follow the job until a worker finishes it
+      const { job_id } = await res.json();
+      setSendMessage("Report queued, waiting for it to be sent...");
+      for (let i = 0; i < 60; i++) {
+        await new Promise(resolve => setTimeout(resolve, 2000));
+        const job = await fetch(`http://localhost:8000/api/inventory/reports/jobs/${job_id}/`).then(r => r.json());
+        if (job.status === "done") {
+          setSendMessage(`Report sent to ${job.recipient}.`);
+          setSending(false);
+          return;
+        }
+        if (job.status === "failed") {
+          setSendMessage(`Failed to send report: ${job.error}`);
+          setSending(false);
+          return;
+        }
+      }
+      setSendMessage("Report is queued and will be emailed when a worker picks it up.");
     } catch {
       setSendMessage("Error connecting to server.");
     }